@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from main import VoilaFocusedScraper
+
+
+PRODUCT_WORDS = ["Organic", "Fresh", "Classic", "Family Size", "Lean", "Aged", "Free Range", "Smoked", "Whole",
+                 "Sliced", "Greek", "Natural", "Spicy", "Honey", "Garden", "Golden", "Farmhouse", "Premium"]
+PRODUCT_NOUNS = ["Apples", "Chicken Breast", "Cheddar", "Yogurt", "Salmon Fillets", "Carrots", "Milk", "Eggs",
+                 "Ground Beef", "Spinach", "Ham", "Pizza", "Bagels", "Butter", "Blueberries", "Pork Chops"]
+PRODUCT_SIZES = ["500 g", "1 kg", "2 lb", "340 g", "1 L", "2 L", "12 ct", "6 x 355 ml", "454 g", "750 ml"]
+
+CATEGORY_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>{title} | Fixture Store</title></head>
+<body>
+<h1>{title}</h1>
+<div id="grid"></div>
+<div id="sentinel" style="height: 40px"></div>
+<script>
+var slug = {slug};
+var pageSize = {page_size};
+var nextPage = 1;
+var loading = false;
+var finished = false;
+
+function render(products) {{
+    var grid = document.getElementById('grid');
+    products.forEach(function (p) {{
+        var card = document.createElement('div');
+        card.className = 'product-card';
+        card.style.height = '180px';
+        var html = '<h3 class="product-card__name">' + p.name + '</h3>' +
+            '<div class="product-card__size">' + p.size.value + '</div>' +
+            '<span data-test="fop-price">$' + p.price.current.amount + '</span>';
+        if (p.promotions.length) {{
+            html += '<span data-test="fop-offer-text">' + p.promotions[0].description + '</span>';
+        }}
+        html += '<button>Add to cart</button>';
+        card.innerHTML = html;
+        grid.appendChild(card);
+    }});
+}}
+
+function loadMore() {{
+    if (loading || finished) {{
+        return;
+    }}
+    loading = true;
+    fetch('/api/products?category=' + slug + '&page=' + nextPage + '&size=' + pageSize)
+        .then(function (response) {{ return response.json(); }})
+        .then(function (payload) {{
+            render(payload.products);
+            finished = payload.products.length < pageSize;
+            nextPage++;
+            loading = false;
+        }});
+}}
+
+new IntersectionObserver(function (entries) {{
+    if (entries[0].isIntersecting) {{
+        loadMore();
+    }}
+}}).observe(document.getElementById('sentinel'));
+loadMore();
+</script>
+</body>
+</html>
+"""
+
+
+def synthetic_products(slug, count, promo_rate, seed):
+    rng = random.Random(f"{seed}:{slug}")
+    products = []
+    for i in range(count):
+        product = {
+            'id': f"{slug}-{i}",
+            'name': f"{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_NOUNS)} #{i}",
+            'price': {'current': {'amount': f"{rng.uniform(0.99, 24.99):.2f}", 'currency': 'CAD'}},
+            'size': {'value': rng.choice(PRODUCT_SIZES)},
+            'promotions': []
+        }
+        if rng.random() < promo_rate:
+            product['promotions'].append({'description': f"Save ${rng.randint(1, 4)}.00"})
+        products.append(product)
+    return products
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, content_type, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        config = self.server.config
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        if parts.path.startswith("/categories/"):
+            slug = parts.path.rsplit("/", 1)[-1]
+            page = CATEGORY_PAGE.format(title=slug.replace("-", " ").title(), slug=json.dumps(slug),
+                                        page_size=config['page_size'])
+            self.send_body(200, "text/html; charset=utf-8", page)
+            return
+
+        if parts.path == "/api/products":
+            slug = query.get('category', [''])[0]
+            page = int(query.get('page', ['1'])[0])
+            size = int(query.get('size', [str(config['page_size'])])[0])
+            products = self.server.catalog(slug)
+            time.sleep(config['latency_ms'] / 1000.0)
+
+            start = (page - 1) * size
+            payload = {'products': products[start:start + size], 'page': page, 'total': len(products)}
+            self.send_body(200, "application/json", json.dumps(payload))
+            return
+
+        self.send_body(404, "text/plain", "not found")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, products=500, page_size=40, latency_ms=150, promo_rate=0.2, seed=42, port=0):
+        super().__init__(("127.0.0.1", port), FixtureHandler)
+        self.config = {
+            'products': products,
+            'page_size': page_size,
+            'latency_ms': latency_ms,
+            'promo_rate': promo_rate,
+            'seed': seed
+        }
+        self.catalogs = {}
+        self.catalog_lock = threading.Lock()
+
+    def catalog(self, slug):
+        with self.catalog_lock:
+            if slug not in self.catalogs:
+                self.catalogs[slug] = synthetic_products(slug, self.config['products'], self.config['promo_rate'],
+                                                         self.config['seed'])
+            return self.catalogs[slug]
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class DriverCallCounter:
+    def __init__(self, driver):
+        self.calls = 0
+        self.by_command = {}
+        original_execute = driver.execute
+
+        # WebElement commands go through the parent driver's execute, so this sees every round trip
+        def counting_execute(driver_command, params=None):
+            self.calls += 1
+            self.by_command[driver_command] = self.by_command.get(driver_command, 0) + 1
+            return original_execute(driver_command, params)
+
+        driver.execute = counting_execute
+
+
+class BrowserMemorySampler:
+    def __init__(self, driver, interval=0.25):
+        self.peak_rss = None
+        self.stopped = threading.Event()
+        self.interval = interval
+        try:
+            import psutil
+            self.root = psutil.Process(driver.service.process.pid)
+        except Exception:
+            self.root = None
+
+    def sample(self):
+        total = 0
+        for process in [self.root] + self.root.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except Exception:
+                continue
+        self.peak_rss = max(self.peak_rss or 0, total)
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.sample()
+            except Exception:
+                pass
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        if self.root is not None:
+            threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        return self.peak_rss
+
+
+def run_scenario(server, name, categories, scraper_options):
+    print(f"\n🏁 Scenario: {name}")
+    workdir = tempfile.mkdtemp(prefix="voila_bench_")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+
+    scraper = VoilaFocusedScraper(headless=True, **scraper_options)
+    scraper.target_categories = {slug.replace("-", " ").title(): f"{server.base_url}/categories/{slug}"
+                                 for slug in categories}
+
+    try:
+        started = time.time()
+        counter = DriverCallCounter(scraper.driver)
+        sampler = BrowserMemorySampler(scraper.driver).start()
+        launch_seconds = time.time() - started
+
+        category_results = []
+        for category_name, category_url in scraper.target_categories.items():
+            calls_before = counter.calls
+            category_started = time.time()
+            scraper.scrape_category(category_name, category_url)
+            seconds = time.time() - category_started
+            products = scraper.products.count(category_name)
+            calls = counter.calls - calls_before
+            category_results.append({
+                'category': category_name,
+                'products': products,
+                'seconds': round(seconds, 3),
+                'products_per_second': round(products / seconds, 2) if seconds else None,
+                'webdriver_calls': calls,
+                'webdriver_calls_per_product': round(calls / products, 3) if products else None
+            })
+
+        total_seconds = time.time() - started
+        total_products = len(scraper.products)
+        peak_rss = sampler.stop()
+        metrics = scraper.metrics.as_dict()
+        return {
+            'scenario': name,
+            'options': scraper_options,
+            'browser_launch_seconds': round(launch_seconds, 3),
+            'total_seconds': round(total_seconds, 3),
+            'total_products': total_products,
+            'products_per_second': round(total_products / total_seconds, 2) if total_seconds else None,
+            'webdriver_calls': counter.calls,
+            'webdriver_calls_per_product': round(counter.calls / total_products, 3) if total_products else None,
+            'webdriver_calls_by_command': counter.by_command,
+            'find_element_failures': metrics['counters'].get('find_element_failures', 0),
+            'peak_browser_rss_mb': round(peak_rss / 1024 / 1024, 1) if peak_rss else None,
+            'phases': metrics['phases'],
+            'categories': category_results
+        }
+    finally:
+        scraper.close()
+        os.chdir(previous_cwd)
+
+
+SCENARIOS = {
+    'js': {'extraction_engine': 'js', 'incremental': True},
+    'js-full-rescan': {'extraction_engine': 'js', 'incremental': False},
+    'webdriver': {'extraction_engine': 'webdriver', 'incremental': False},
+    'capture': {'capture_network': True},
+    'lean': {'extraction_engine': 'js', 'incremental': True, 'lean': True},
+    'bounded': {'extraction_engine': 'js', 'incremental': True, 'bounded_dom': True},
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Voila scraper against a local fixture store")
+    parser.add_argument("--products", type=int, default=500, help="Products per category (default: 500)")
+    parser.add_argument("--page-size", type=int, default=40, help="Products per lazy-load batch (default: 40)")
+    parser.add_argument("--latency-ms", type=int, default=150, help="Lazy-load response latency (default: 150)")
+    parser.add_argument("--promo-rate", type=float, default=0.2,
+                        help="Share of products with a promotion (default: 0.2)")
+    parser.add_argument("--categories", type=int, default=2, help="Number of fixture categories (default: 2)")
+    parser.add_argument("--scenarios", default="js,webdriver",
+                        help=f"Comma-separated scenarios to run: {', '.join(SCENARIOS)} (default: js,webdriver)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic catalogue (default: 42)")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--serve", action="store_true",
+                        help="Only run the fixture server (for manual runs of main.py --category NAME=URL)")
+    parser.add_argument("--port", type=int, default=0, help="Fixture server port (default: any free port)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    server = FixtureServer(products=args.products, page_size=args.page_size, latency_ms=args.latency_ms,
+                           promo_rate=args.promo_rate, seed=args.seed, port=args.port).start()
+    categories = [f"fixture-category-{i + 1}" for i in range(args.categories)]
+
+    if args.serve:
+        print(f"🧪 Fixture store running at {server.base_url}")
+        for slug in categories:
+            print(f"  {server.base_url}/categories/{slug}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    scenario_names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenario_names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'fixture': dict(server.config, categories=len(categories)),
+        'scenarios': []
+    }
+
+    try:
+        for name in scenario_names:
+            results['scenarios'].append(run_scenario(server, name, categories, dict(SCENARIOS[name])))
+    finally:
+        server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"\n📁 Benchmark results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
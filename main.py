@@ -1,50 +1,1045 @@
-import requests
 import json
 import time
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
 import re
 import os
 import glob
 import sys
-import subprocess
+import argparse
+import asyncio
+import base64
+import bisect
+import csv
+import gzip
+import heapq
+import itertools
+import math
+import sqlite3
+import queue
+import socket
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+CARD_RECORD_JS = """
+function voilaCardRecord(card) {
+    var price = card.querySelector("span[data-test='fop-price']");
+    var promo = card.querySelector("span[data-test='fop-offer-text']");
+    return {
+        text: card.innerText || '',
+        price_text: price ? price.innerText : null,
+        promo_text: promo ? promo.innerText : null
+    };
+}
+"""
+
+CARD_EXTRACTION_JS = CARD_RECORD_JS + """
+return arguments[0].map(voilaCardRecord);
+"""
+
+PRODUCT_CARD_SELECTOR = "[class*='product-card']"
+CARD_WATERMARK_ATTR = "data-voila-seen"
+# Only outer cards carry the watermark, so the nodes inside a seen card are excluded by ancestry
+UNSEEN_CARD_FILTER = f":not([{CARD_WATERMARK_ATTR}]):not([{CARD_WATERMARK_ATTR}] *)"
+
+# The selector also matches elements inside a card (product-card__name, ...); only whole cards are products
+OUTER_CARDS_JS = """
+function voilaOuterCards(selector, filter) {
+    return Array.prototype.filter.call(document.querySelectorAll(selector + (filter || '')), function (node) {
+        return !(node.parentElement && node.parentElement.closest(selector));
+    });
+}
+"""
+
+FIND_CARDS_JS = OUTER_CARDS_JS + """
+return voilaOuterCards(arguments[0], arguments[1]);
+"""
+
+NEW_CARD_EXTRACTION_JS = CARD_RECORD_JS + OUTER_CARDS_JS + """
+var watermark = arguments[1];
+var cards = voilaOuterCards(arguments[0], ':not([' + watermark + ']):not([' + watermark + '] *)');
+var records = [];
+for (var i = 0; i < cards.length; i++) {
+    var record = voilaCardRecord(cards[i]);
+    // Placeholders that have not rendered yet stay unmarked and are picked up on a later pass
+    if (record.text.trim().length < 10) {
+        continue;
+    }
+    cards[i].setAttribute(watermark, '1');
+    records.push(record);
+}
+return records;
+"""
+
+MARK_CARDS_SEEN_JS = """
+for (var i = 0; i < arguments[0].length; i++) {
+    arguments[0][i].setAttribute(arguments[1], '1');
+}
+"""
+
+# Counts in-flight fetch/XHR requests so waits can tell when the page has gone quiet
+NETWORK_TRACKER_JS = """
+(function () {
+    if (window.__voilaInflight !== undefined) {
+        return;
+    }
+    window.__voilaInflight = 0;
+    if (window.performance && performance.setResourceTimingBufferSize) {
+        // Keep timing entries for the whole infinite scroll so transferred bytes can be totalled
+        performance.setResourceTimingBufferSize(100000);
+    }
+    var done = function () { window.__voilaInflight = Math.max(0, window.__voilaInflight - 1); };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            window.__voilaInflight++;
+            return originalFetch.apply(this, arguments).then(function (response) {
+                done();
+                return response;
+            }, function (error) {
+                done();
+                throw error;
+            });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__voilaInflight++;
+        this.addEventListener('loadend', done);
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+# Hollowed cards no longer match the selector, so their count is added back to keep growth checks monotonic
+PAGE_STATE_JS = """
+return {
+    cards: document.querySelectorAll(arguments[0]).length + (window.__voilaHollowed || 0),
+    height: document.body ? document.body.scrollHeight : 0,
+    inflight: window.__voilaInflight === undefined ? -1 : window.__voilaInflight
+};
+"""
+
+SCROLL_TO_BOTTOM_JS = """
+var state = {
+    cards: document.querySelectorAll(arguments[0]).length + (window.__voilaHollowed || 0),
+    height: document.body.scrollHeight
+};
+window.scrollTo(0, document.body.scrollHeight);
+return state;
+"""
+
+HOLLOW_ATTR = "data-voila-hollow"
+# Cards nearest the viewport stay intact so the storefront's own scroll and lazy-load logic keeps working
+DOM_KEEP_CARDS = 60
+
+HOLLOW_CARDS_JS = OUTER_CARDS_JS + """
+var selector = arguments[0], watermark = arguments[1], hollowAttr = arguments[2];
+var keep = arguments[3], minBatch = arguments[4], dryRun = arguments[5];
+var cards = voilaOuterCards(selector, (watermark ? '[' + watermark + ']' : '') + ':not([' + hollowAttr + '])');
+var count = cards.length - keep;
+if (count < minBatch || dryRun) {
+    return Math.max(count, 0);
+}
+// Read every height before writing so the whole batch costs a single layout
+var heights = [];
+for (var i = 0; i < count; i++) {
+    heights.push(cards[i].getBoundingClientRect().height);
+}
+for (var i = 0; i < count; i++) {
+    var card = cards[i];
+    window.__voilaHollowed = (window.__voilaHollowed || 0) + card.querySelectorAll(selector).length;
+    card.style.height = heights[i] + 'px';
+    card.style.boxSizing = 'border-box';
+    card.textContent = '';
+    card.setAttribute(hollowAttr, '1');
+}
+return count;
+"""
+
+ENDPOINTS_FILE = "voila_endpoints.json"
+PAGE_PARAMS = ['page', 'pageNumber', 'pageNo', 'p']
+OFFSET_PARAMS = ['offset', 'start', 'from', 'skip']
+PAGE_SIZE_PARAMS = ['limit', 'size', 'pageSize', 'maxPageSize', 'rows', 'count']
+LISTING_TOTAL_KEYS = ['total', 'totalCount', 'totalResults', 'totalItems', 'totalHits', 'numFound']
+LISTING_PAGES_KEYS = ['totalPages', 'pageCount', 'numberOfPages']
+# Flag name -> the value that means more pages follow
+LISTING_MORE_KEYS = {'hasMore': True, 'hasNextPage': True, 'hasNext': True, 'last': False, 'isLastPage': False}
+
+SNAPSHOT_CATEGORY_MARKER = "<!-- voila-category: "
+
+# Every card ever loaded stays in the DOM, so plain scrolling stops before the tab gets too heavy
+SCROLL_CAP = 100
+PRODUCT_CAP = 1000
+# --bounded-dom keeps memory flat, so these only guard against a feed that never ends
+BOUNDED_SCROLL_CAP = 5000
+BOUNDED_PRODUCT_CAP = 100000
+
+PRODUCT_LOG_DIR = "voila_log"
+PROGRESS_FILE = "voila_focused_groceries_progress.csv"
+BUDGET_PROGRESS_FILE = "voila_budget_items_progress.csv"
+FINAL_FILE = "voila_focused_groceries_FINAL.csv"
+PRODUCT_COLUMNS = ['name', 'price', 'size', 'unit_price', 'category', 'has_price', 'promotion']
+EXPORT_COLUMNS = PRODUCT_COLUMNS + ['unit_price_basis']
+HISTORY_DB = "voila_history.db"
+QUEUE_DB = "voila_queue.db"
+DEFAULT_STORE = "voila"
+DEFAULT_LEASE_SECONDS = 120
+
+# The closing \b keeps words like "12 Large" from being read as a 12 L size
+SIZE_PATTERN = re.compile(r'((?:\d+\s*[x×]\s*)?\d+(?:\.\d+)?\s*(?:g|kg|lb|oz|ml|l|pack|ct|count|each|pc|lbs)\b)',
+                          re.IGNORECASE)
+UNIT_SIZE_PATTERN = re.compile(
+    r'(?:(?P<count>\d+)\s*[x×]\s*)?(?P<quantity>\d+(?:\.\d+)?)\s*'
+    r'(?P<unit>kg|g|lbs?|oz|ml|l|pack|ct|count|each|pc)\b', re.IGNORECASE)
+# Factor to the canonical unit (grams, millilitres or items) and the basis the unit price is quoted on
+UNIT_CONVERSIONS = {
+    'g': (1.0, 'g'), 'kg': (1000.0, 'g'), 'lb': (453.592, 'g'), 'lbs': (453.592, 'g'), 'oz': (28.3495, 'g'),
+    'ml': (1.0, 'ml'), 'l': (1000.0, 'ml'),
+    'pack': (1.0, 'each'), 'ct': (1.0, 'each'), 'count': (1.0, 'each'), 'each': (1.0, 'each'), 'pc': (1.0, 'each'),
+}
+UNIT_PRICE_BASIS = {'g': 'per 100 g', 'ml': 'per 100 ml', 'each': 'each'}
+
+LOAD_STATS_FILE = "voila_load_stats.json"
+DEFAULT_PROFILE_DIR = "voila_chrome_profile"
+# Card text, prices and promotions never depend on these, so lean mode refuses to download them
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*facebook.com/tr*", "*connect.facebook*", "*hotjar.com*", "*optimizely.com*",
+    "*bat.bing.com*", "*analytics.tiktok.com*", "*nr-data.net*", "*newrelic.com*", "*segment.io*",
+    "*segment.com*", "*quantummetric.com*", "*demdex.net*", "*omtrdc.net*", "*adobedtm.com*",
+    "*criteo.*", "*pinterest.com/ct*", "*snapchat.com*", "*clarity.ms*",
+]
+
+PAGE_LOAD_STATS_JS = """
+var navigation = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var transferred = navigation ? navigation.transferSize : 0;
+for (var i = 0; i < resources.length; i++) {
+    transferred += resources[i].transferSize || 0;
+}
+return {
+    transferred: transferred,
+    requests: resources.length + 1,
+    dom_ready_ms: navigation ? Math.round(navigation.domContentLoadedEventEnd) : null
+};
+"""
+
+load_stats_lock = threading.Lock()
+
+CATEGORY_GROUPS = {
+    "protein": ["Meat & Seafood", "Dairy & Eggs", "Cheese", "Deli"],
+    "produce": ["Fresh Fruits & Vegetables"],
+    "deals": ["Flyer Deals", "Scene+ Deals"],
+}
+
+SCRAPE_METADATA_FILE = "voila_scrape_metadata.json"
+DEFAULT_TTL_HOURS = 72.0
+# Deals rotate with the flyer and produce reprices often; shelf-stable aisles can go longer between runs
+CATEGORY_TTL_HOURS = {
+    "Flyer Deals": 6.0,
+    "Scene+ Deals": 12.0,
+    "Fresh Fruits & Vegetables": 24.0,
+    "Meat & Seafood": 48.0,
+    "Deli": 48.0,
+}
+metadata_lock = threading.Lock()
+
+DRIVER_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "voila", "chromedriver.json")
+
+BROWSER_MEMORY_JS = """
+return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;
+"""
+
+
+def parse_snapshot_file(path):
+    from bs4 import BeautifulSoup
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        html = f.read()
+
+    category_name = None
+    if html.startswith(SNAPSHOT_CATEGORY_MARKER):
+        category_name = html[len(SNAPSHOT_CATEGORY_MARKER):html.index(" -->")]
 
+    try:
+        soup = BeautifulSoup(html, "lxml")
+    except Exception:
+        soup = BeautifulSoup(html, "html.parser")
+
+    records = []
+    matches = soup.select(PRODUCT_CARD_SELECTOR)
+    match_ids = {id(node) for node in matches}
+    # Same selectors as the live extraction; get_text stands in for innerText
+    for card in matches:
+        if any(id(parent) in match_ids for parent in card.parents):
+            continue
+        price = card.select_one("span[data-test='fop-price']")
+        promo = card.select_one("span[data-test='fop-offer-text']")
+        records.append({
+            'text': card.get_text('\n', strip=True),
+            'price_text': price.get_text(strip=True) if price else None,
+            'promo_text': promo.get_text(strip=True) if promo else None
+        })
+
+    return category_name, records
+
+
+def resolve_chromedriver(refresh=False):
+    override = os.environ.get("VOILA_CHROMEDRIVER")
+    if override:
+        return override
+
+    # Reuse the last resolved binary so startup needs neither a version lookup nor the network
+    if not refresh and os.path.exists(DRIVER_CACHE_FILE):
+        try:
+            with open(DRIVER_CACHE_FILE, encoding='utf-8') as f:
+                driver_path = json.load(f)['path']
+            if os.path.exists(driver_path):
+                return driver_path
+        except Exception:
+            pass
 
-class VoilaFocusedScraper:
-    def __init__(self, headless=True):
-        self.seen_product_names = set()
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless")
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        driver_path = ChromeDriverManager().install()
+    except ImportError:
+        print("webdriver-manager not found, using default ChromeDriver")
+        return None
+    except Exception as e:
+        print(f"⚠️  Could not resolve ChromeDriver ({e}), using default ChromeDriver")
+        return None
+
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+        with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'path': driver_path, 'resolved_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+    except Exception as e:
+        print(f"⚠️  Could not cache ChromeDriver path: {e}")
+
+    return driver_path
+
+
+def launch_chrome(driver_path, chrome_options):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    if driver_path:
+        return webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+    return webdriver.Chrome(options=chrome_options)
+
+
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
 
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--disable-features=VizDisplayCompositor")
-        chrome_options.add_argument("--memory-pressure-off")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-images")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
 
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.started = time.time()
+        self.phases = {}
+        self.counters = {}
+        self.command_counters = []
+        self.categories = {}
+
+    @contextmanager
+    def phase(self, name, category_name=None):
+        started = time.perf_counter()
         try:
-            from webdriver_manager.chrome import ChromeDriverManager
-            from selenium.webdriver.chrome.service import Service
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        except ImportError:
-            print("webdriver-manager not found, using default ChromeDriver")
-            self.driver = webdriver.Chrome(options=chrome_options)
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started, category_name)
+
+    def add_time(self, name, seconds, category_name=None):
+        with self.lock:
+            phase = self.phases.setdefault(name, {'seconds': 0.0, 'count': 0, 'max_seconds': 0.0})
+            phase['seconds'] += seconds
+            phase['count'] += 1
+            phase['max_seconds'] = max(phase['max_seconds'], seconds)
+            if category_name:
+                category_phases = self.categories.setdefault(category_name, {}).setdefault('phases', {})
+                category_phases[name] = category_phases.get(name, 0.0) + seconds
+
+    def increment(self, name, amount=1, category_name=None):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if category_name:
+                category = self.categories.setdefault(category_name, {})
+                category[name] = category.get(name, 0) + amount
+
+    def command_counter(self):
+        # One dict per driver, written only by the thread driving it, so each round trip stays a bare update
+        counter = {}
+        with self.lock:
+            self.command_counters.append(counter)
+        return counter
+
+    def command_totals(self):
+        totals = {}
+        for counter in self.command_counters:
+            for command, count in counter.copy().items():
+                totals[command] = totals.get(command, 0) + count
+        return totals
+
+    def record_memory(self, category_name, name, value):
+        if value is None:
+            return
+        with self.lock:
+            category = self.categories.setdefault(category_name, {})
+            category[name] = max(category.get(name, 0), value)
+            self.counters[name] = max(self.counters.get(name, 0), value)
+
+    def as_dict(self):
+        with self.lock:
+            commands = self.command_totals()
+            return {
+                'started_at': self.started_at,
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'phases': {name: {'seconds': round(phase['seconds'], 3), 'count': phase['count'],
+                                  'max_seconds': round(phase['max_seconds'], 3)}
+                           for name, phase in self.phases.items()},
+                'counters': dict(self.counters),
+                'webdriver_commands': commands,
+                'webdriver_commands_total': sum(commands.values()),
+                'categories': json.loads(json.dumps(self.categories))
+            }
+
+    def prometheus_text(self):
+        metrics = self.as_dict()
+        lines = [
+            "# TYPE voila_run_elapsed_seconds gauge",
+            f"voila_run_elapsed_seconds {metrics['elapsed_seconds']}",
+            "# TYPE voila_phase_seconds_total counter",
+        ]
+        lines += [f'voila_phase_seconds_total{{phase="{prometheus_label(name)}"}} {phase["seconds"]}'
+                  for name, phase in metrics['phases'].items()]
+        lines.append("# TYPE voila_phase_runs_total counter")
+        lines += [f'voila_phase_runs_total{{phase="{prometheus_label(name)}"}} {phase["count"]}'
+                  for name, phase in metrics['phases'].items()]
+        lines.append("# TYPE voila_webdriver_commands_total counter")
+        lines += [f'voila_webdriver_commands_total{{command="{prometheus_label(command)}"}} {count}'
+                  for command, count in metrics['webdriver_commands'].items()]
+        for name, value in metrics['counters'].items():
+            lines.append(f"voila_{re.sub(r'[^a-zA-Z0-9_]', '_', name)} {value}")
+        for category_name, category in metrics['categories'].items():
+            if 'products' in category:
+                lines.append(f'voila_category_products{{category="{prometheus_label(category_name)}"}} {category["products"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, metrics_format="json"):
+        content = self.prometheus_text() if metrics_format == "prometheus" else json.dumps(self.as_dict(), indent=2)
+        # Textfile collectors may read at any moment, so the file is swapped in atomically
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+
+
+class AdaptiveWait:
+    def __init__(self, initial, minimum=0.25, cap=10.0, headroom=2.0, window=25):
+        self.initial = initial
+        self.minimum = minimum
+        self.cap = cap
+        self.headroom = headroom
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def timeout(self):
+        # Until a few loads have been measured, fall back to the conservative initial value
+        if len(self.samples) < 3:
+            return min(self.initial, self.cap)
+
+        ordered = sorted(self.samples)
+        p90 = ordered[int(0.9 * (len(ordered) - 1))]
+        return max(self.minimum, min(self.cap, p90 * self.headroom))
+
+
+class page_grew_or_went_idle:
+    def __init__(self, previous_cards, previous_height, idle_after=0.5):
+        self.previous_cards = previous_cards
+        self.previous_height = previous_height
+        self.idle_after = idle_after
+        self.idle_since = None
+        self.grew = False
+        self.state = None
+
+    def __call__(self, driver):
+        state = driver.execute_script(PAGE_STATE_JS, PRODUCT_CARD_SELECTOR)
+        self.state = state
+
+        height_grew = self.previous_height is not None and state['height'] > self.previous_height
+        if state['cards'] > self.previous_cards or height_grew:
+            self.grew = True
+            return state
+
+        # No requests in flight and nothing rendered for a while: the page has settled without growing
+        if state['inflight'] == 0:
+            now = time.time()
+            if self.idle_since is None:
+                self.idle_since = now
+            elif now - self.idle_since >= self.idle_after:
+                return state
+        else:
+            self.idle_since = None
 
-        self.driver.set_page_load_timeout(30)
-        self.driver.implicitly_wait(5)
+        return False
+
+
+def clean_value(value):
+    # Rows reloaded through pandas carry NaN for missing values
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def normalize_unit_prices(df):
+    import numpy as np
+    import pandas as pd
+
+    if df.empty:
+        df['unit_price_basis'] = pd.Series(dtype=object)
+        return df
+
+    # Pack sizes repeat heavily, so the regex only runs once per distinct size string
+    # Missing sizes become '' first: pandas 3 keeps NaN through astype(str) and factorize would code it -1
+    codes, sizes = pd.factorize(df['size'].fillna('').astype(str))
+    parts = pd.Series(sizes).str.extract(UNIT_SIZE_PATTERN).iloc[codes].reset_index(drop=True)
+    parts.index = df.index
+    count = pd.to_numeric(parts['count'], errors='coerce').fillna(1.0)
+    quantity = pd.to_numeric(parts['quantity'], errors='coerce')
+    unit = parts['unit'].str.lower()
+
+    factor = unit.map({u: conversion[0] for u, conversion in UNIT_CONVERSIONS.items()})
+    canonical = unit.map({u: conversion[1] for u, conversion in UNIT_CONVERSIONS.items()})
+    total = count * quantity * factor
+
+    price = pd.to_numeric(df['price'], errors='coerce')
+    per = np.where(canonical == 'each', 1.0, 100.0)
+    valid = (price > 0) & (total > 0)
+
+    df['unit_price'] = np.where(valid, (price / total.where(valid) * per).round(4), np.nan)
+    df['unit_price_basis'] = canonical.map(UNIT_PRICE_BASIS).where(valid)
+    return df
+
+
+def product_key(product):
+    name = re.sub(r'\s+', ' ', str(product.get('name') or '')).strip().lower()
+    size = re.sub(r'\s+', '', str(clean_value(product.get('size')) or '')).lower()
+    return f"{name}|{size}"
+
+
+class ProductRecord:
+    __slots__ = PRODUCT_COLUMNS + ['key']
+
+    def __init__(self, product, key):
+        for column in PRODUCT_COLUMNS:
+            setattr(self, column, clean_value(product.get(column)))
+        self.key = key
+
+    def as_dict(self):
+        return {column: getattr(self, column) for column in PRODUCT_COLUMNS}
+
+
+class ProductStore:
+    def __init__(self):
+        self.partitions = {}
+        self.index = {}
+        self.records = []
+
+    def remove_category(self, category_name):
+        removed = self.partitions.pop(category_name, [])
+        if removed:
+            self.records = [record for record in self.records if record.category != category_name]
+            for record in removed:
+                del self.index[(category_name, record.key)]
+        return len(removed)
+
+    def __len__(self):
+        return len(self.records)
+
+    def contains(self, product):
+        return (product['category'], product_key(product)) in self.index
+
+    def add(self, product):
+        # Products are unique per category, so a flyer deal can also appear under its own aisle
+        key = product_key(product)
+        index_key = (product['category'], key)
+        if index_key in self.index:
+            return False
+
+        record = ProductRecord(product, key)
+        self.index[index_key] = record
+        self.partitions.setdefault(record.category, []).append(record)
+        self.records.append(record)
+        return True
+
+    def extend(self, products):
+        return sum(1 for product in products if self.add(product))
+
+    def count(self, category_name):
+        return len(self.partitions.get(category_name, []))
+
+    def categories(self):
+        return list(self.partitions)
+
+    def category_products(self, category_name):
+        return [record.as_dict() for record in self.partitions.get(category_name, [])]
+
+    def as_dicts(self, start=0):
+        return [record.as_dict() for record in self.records[start:]]
+
+
+class PriceHistoryStore:
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        # Queue workers on several machines write here at once, so wait for the lock instead of failing
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # WAL relies on shared memory on one host; a rollback journal only needs file locks on a network share
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.create_schema()
+
+    def create_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS observations (
+                run_id INTEGER NOT NULL REFERENCES runs(run_id),
+                store TEXT NOT NULL DEFAULT 'voila',
+                product_key TEXT NOT NULL,
+                category TEXT NOT NULL,
+                name TEXT NOT NULL,
+                price REAL,
+                size TEXT,
+                unit_price REAL,
+                unit_price_basis TEXT,
+                promotion TEXT,
+                scraped_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, store, category, product_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_observations_key ON observations (product_key, run_id);
+            CREATE INDEX IF NOT EXISTS idx_observations_category ON observations (category, scraped_at);
+            CREATE INDEX IF NOT EXISTS idx_observations_scraped ON observations (scraped_at);
+        """)
+
+        columns = [row['name'] for row in self.conn.execute("PRAGMA table_info(observations)")]
+        if 'unit_price_basis' not in columns:
+            self.conn.execute("ALTER TABLE observations ADD COLUMN unit_price_basis TEXT")
+            columns.append('unit_price_basis')
+        if 'store' not in columns:
+            self.migrate_store_column(columns)
+        # Created after the migrations so the columns exist; --query walks these instead of sorting each call
+        self.conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_observations_price ON observations (run_id, price);
+            CREATE INDEX IF NOT EXISTS idx_observations_unit_price
+                ON observations (run_id, unit_price_basis, unit_price);
+            CREATE INDEX IF NOT EXISTS idx_observations_category_price ON observations (run_id, category, price);
+        """)
+
+    def migrate_store_column(self, columns):
+        # The store has to join the primary key, which SQLite can only change by rebuilding the table
+        columns = ", ".join(columns)
+        create = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'observations'").fetchone()['sql']
+        with self.conn:
+            self.conn.execute("ALTER TABLE observations RENAME TO observations_old")
+            self.conn.execute(create.replace("product_key TEXT NOT NULL,",
+                                             "store TEXT NOT NULL DEFAULT 'voila', product_key TEXT NOT NULL,", 1)
+                              .replace("PRIMARY KEY (run_id, category, product_key)",
+                                       "PRIMARY KEY (run_id, store, category, product_key)"))
+            self.conn.execute(f"INSERT INTO observations ({columns}) SELECT {columns} FROM observations_old")
+            self.conn.execute("DROP TABLE observations_old")
+        self.create_schema()
+
+    def start_run(self, started_at):
+        with self.conn:
+            return self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (started_at,)).lastrowid
+
+    def add_observations(self, run_id, products, store=DEFAULT_STORE, scraped_at=None):
+        # scraped_at maps a category to when it was really scraped; anything missing counts as just now
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        scraped_at = scraped_at or {}
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO observations "
+                "(run_id, store, product_key, category, name, price, size, unit_price, unit_price_basis, "
+                "promotion, scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, store, product_key(p), p['category'], p['name'], clean_value(p.get('price')),
+                  clean_value(p.get('size')), clean_value(p.get('unit_price')),
+                  clean_value(p.get('unit_price_basis')), clean_value(p.get('promotion')),
+                  scraped_at.get(p['category'], now))
+                 for p in products])
+
+    def finish_run(self, run_id):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ? AND finished_at IS NULL",
+                              (time.strftime('%Y-%m-%d %H:%M:%S'), run_id))
+
+    def record_run(self, products, started_at, store=DEFAULT_STORE, scraped_at=None):
+        run_id = self.start_run(started_at)
+        self.add_observations(run_id, products, store, scraped_at)
+        self.finish_run(run_id)
+        return run_id
+
+    def run_ids(self):
+        # Rounds still being filled by queue workers are left out until their last job finishes
+        return [row['run_id'] for row in
+                self.conn.execute("SELECT run_id FROM runs WHERE finished_at IS NOT NULL ORDER BY run_id")]
+
+    def latest_run_pair(self):
+        run_ids = self.run_ids()
+        if len(run_ids) < 2:
+            return None
+        return run_ids[-2], run_ids[-1]
+
+    def run_products(self, run_id, max_price=None):
+        query = ("SELECT name, price, size, unit_price, category, price > 0 AS has_price, promotion, "
+                 "unit_price_basis, store "
+                 "FROM observations WHERE run_id = ?")
+        params = [run_id]
+        if max_price is not None:
+            query += " AND price IS NOT NULL AND price <= ?"
+            params.append(max_price)
+        rows = [dict(row) for row in self.conn.execute(query + " ORDER BY store, category, name", params)]
+        for row in rows:
+            row['has_price'] = bool(row['has_price'])
+        return rows
+
+    def query_products(self, run_id, categories=None, sort_by='unit_price', basis=UNIT_PRICE_BASIS['g'],
+                       max_price=None, max_unit_price=None, on_promotion=False, limit=20):
+        query = ("SELECT name, price, size, unit_price, unit_price_basis, category, promotion "
+                 "FROM observations WHERE run_id = ?")
+        params = [run_id]
+        if sort_by == 'price':
+            query += " AND price IS NOT NULL"
+        else:
+            query += " AND unit_price IS NOT NULL AND unit_price_basis IS ?"
+            params.append(basis)
+        if categories:
+            query += f" AND category IN ({', '.join('?' * len(categories))})"
+            params.extend(categories)
+        if max_price is not None:
+            query += " AND price <= ?"
+            params.append(max_price)
+        if max_unit_price is not None:
+            query += " AND unit_price <= ?"
+            params.append(max_unit_price)
+        if on_promotion:
+            query += " AND promotion IS NOT NULL AND promotion != ''"
+        query += f" ORDER BY {'price' if sort_by == 'price' else 'unit_price'}, store, category, name"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        # A cursor, so matches stream out while SQLite walks the index
+        for row in self.conn.execute(query, params):
+            yield dict(row)
+
+    def price_changes(self, old_run, new_run):
+        return [dict(row) for row in self.conn.execute("""
+            SELECT n.store, n.category, n.name, n.size, o.price AS old_price, n.price AS new_price,
+                   ROUND(n.price - o.price, 2) AS change
+            FROM observations n
+            JOIN observations o ON o.run_id = ? AND o.store = n.store AND o.product_key = n.product_key
+                               AND o.category = n.category
+            WHERE n.run_id = ? AND n.price IS NOT o.price
+            ORDER BY change
+        """, (old_run, new_run))]
+
+    def new_items(self, old_run, new_run):
+        return [dict(row) for row in self.conn.execute("""
+            SELECT n.store, n.category, n.name, n.size, n.price, n.promotion
+            FROM observations n
+            WHERE n.run_id = ? AND NOT EXISTS (
+                SELECT 1 FROM observations o
+                WHERE o.run_id = ? AND o.store = n.store AND o.product_key = n.product_key
+                  AND o.category = n.category)
+            ORDER BY n.store, n.category, n.name
+        """, (new_run, old_run))]
+
+    def removed_items(self, old_run, new_run):
+        return self.new_items(new_run, old_run)
+
+    def promotion_changes(self, old_run, new_run):
+        return [dict(row) for row in self.conn.execute("""
+            SELECT n.store, n.category, n.name, n.size, n.price, o.promotion AS old_promotion,
+                   n.promotion AS new_promotion
+            FROM observations n
+            JOIN observations o ON o.run_id = ? AND o.store = n.store AND o.product_key = n.product_key
+                               AND o.category = n.category
+            WHERE n.run_id = ? AND n.promotion IS NOT o.promotion
+            ORDER BY n.store, n.category, n.name
+        """, (old_run, new_run))]
+
+    def export_csv(self, run_id, path, max_price=None):
+        import pandas as pd
+
+        rows = self.run_products(run_id, max_price=max_price)
+        if rows:
+            pd.DataFrame(rows, columns=EXPORT_COLUMNS).to_csv(path, index=False)
+        return len(rows)
+
+    def close(self):
+        self.conn.close()
+
+
+class WorkQueue:
+    def __init__(self, path=QUEUE_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        # Autocommit mode: every claim runs in an explicit BEGIN IMMEDIATE so two workers never take the same job
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        # Shared between machines, so no WAL (see PriceHistoryStore)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.create_schema()
+
+    def create_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                store TEXT NOT NULL,
+                category TEXT NOT NULL,
+                url TEXT NOT NULL,
+                run_id INTEGER,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (store, category)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_expires);
+        """)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def enqueue(self, jobs, run_id):
+        now = time.time()
+        with self.transaction() as conn:
+            active = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires >= ?",
+                                  (now,)).fetchone()[0]
+            conn.executemany("""
+                INSERT INTO jobs (store, category, url, run_id, status, attempts, updated_at)
+                VALUES (?, ?, ?, ?, 'pending', 0, ?)
+                ON CONFLICT (store, category) DO UPDATE SET
+                    url = excluded.url, run_id = excluded.run_id, status = 'pending', attempts = 0,
+                    lease_owner = NULL, lease_expires = NULL, last_error = NULL, updated_at = excluded.updated_at
+            """, [(store, category, url, run_id, now) for store, category, url in jobs])
+        return active
+
+    def lease(self, owner, lease_seconds, max_attempts):
+        now = time.time()
+        with self.transaction() as conn:
+            # A worker that stopped heartbeating has crashed or hung; its job is up for grabs again
+            conn.execute("""
+                UPDATE jobs SET status = 'failed', last_error = 'lease expired', lease_owner = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, now, max_attempts))
+            row = conn.execute("""
+                SELECT * FROM jobs
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY attempts, updated_at
+                LIMIT 1
+            """, (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("""
+                UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1,
+                                updated_at = ?
+                WHERE store = ? AND category = ?
+            """, (owner, now + lease_seconds, now, row['store'], row['category']))
+        job = dict(row)
+        job['attempts'] += 1
+        job['expired_owner'] = row['lease_owner'] if row['status'] == 'leased' else None
+        return job
+
+    def update_owned(self, job, owner, sql, params):
+        with self.transaction() as conn:
+            return conn.execute(sql + " WHERE store = ? AND category = ? AND lease_owner = ? AND status = 'leased'",
+                                params + (job['store'], job['category'], owner)).rowcount == 1
+
+    def heartbeat(self, job, owner, lease_seconds):
+        now = time.time()
+        return self.update_owned(job, owner, "UPDATE jobs SET lease_expires = ?, updated_at = ?",
+                                 (now + lease_seconds, now))
+
+    def complete(self, job, owner):
+        return self.update_owned(job, owner, "UPDATE jobs SET status = 'done', lease_owner = NULL, "
+                                             "lease_expires = NULL, last_error = NULL, updated_at = ?",
+                                 (time.time(),))
+
+    def fail(self, job, owner, error, max_attempts):
+        status = 'pending' if job['attempts'] < max_attempts else 'failed'
+        self.update_owned(job, owner, "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+                                      "last_error = ?, updated_at = ?", (status, error, time.time()))
+        return status
+
+    def open_jobs(self, run_id=None):
+        query = "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')"
+        params = ()
+        if run_id is not None:
+            query += " AND run_id = ?"
+            params = (run_id,)
+        with self.lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def jobs(self):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute("SELECT * FROM jobs ORDER BY store, category")]
+
+    def close(self):
+        self.conn.close()
+
+
+class BudgetIndex:
+    def __init__(self, rows):
+        self.rows = []
+        for row in rows:
+            row = {column: clean_value(row.get(column)) for column in EXPORT_COLUMNS}
+            row['price'] = self.number(row['price'])
+            row['unit_price'] = self.number(row['unit_price'])
+            row['promotion'] = row['promotion'] or None
+            self.rows.append(row)
+
+        priced = [i for i, row in enumerate(self.rows) if row['price'] is not None]
+        unit_priced = [i for i, row in enumerate(self.rows) if row['unit_price'] is not None]
+
+        # Every (category, key, basis) slice is kept pre-sorted, so a query is a bisect plus a short scan
+        self.indexes = {}
+        for i in sorted(priced, key=lambda i: self.rows[i]['price']):
+            self.indexes.setdefault((None, 'price', None), []).append(i)
+            self.indexes.setdefault((self.rows[i]['category'], 'price', None), []).append(i)
+        for i in sorted(unit_priced, key=lambda i: self.rows[i]['unit_price']):
+            basis = self.rows[i]['unit_price_basis']
+            self.indexes.setdefault((None, 'unit_price', basis), []).append(i)
+            self.indexes.setdefault((self.rows[i]['category'], 'unit_price', basis), []).append(i)
+        self.sort_values = {name: [self.rows[i][name[1]] for i in index] for name, index in self.indexes.items()}
+        self.promoted = {i for i, row in enumerate(self.rows) if row['promotion']}
+
+    @staticmethod
+    def number(value):
+        try:
+            return float(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def from_csv(cls, path):
+        # The csv module keeps queries free of the pandas import
+        with open(path, newline='', encoding='utf-8') as f:
+            return cls(csv.DictReader(f))
+
+    def categories(self):
+        return sorted({row['category'] for row in self.rows if row['category']})
+
+    def query(self, categories=None, sort_by='unit_price', basis=UNIT_PRICE_BASIS['g'], max_price=None,
+              max_unit_price=None, on_promotion=False, limit=20):
+        if sort_by == 'price':
+            basis = None
+            bound = max_price
+        else:
+            bound = max_unit_price
+
+        slices = []
+        for category_name in categories or [None]:
+            name = (category_name, sort_by, basis)
+            index = self.indexes.get(name, [])
+            end = len(index) if bound is None else bisect.bisect_right(self.sort_values.get(name, []), bound)
+            slices.append(index[:end])
 
-        self.products = []
+        candidates = slices[0] if len(slices) == 1 else heapq.merge(
+            *slices, key=lambda i: self.rows[i][sort_by])
+
+        found = 0
+        for i in candidates:
+            if limit is not None and found >= limit:
+                return
+            row = self.rows[i]
+            if on_promotion and i not in self.promoted:
+                continue
+            if max_price is not None and (row['price'] is None or row['price'] > max_price):
+                continue
+            if max_unit_price is not None and (row['unit_price'] is None or row['unit_price'] > max_unit_price):
+                continue
+            found += 1
+            yield row
+
+    @staticmethod
+    def compact(row):
+        # Short keys and no empty fields keep each line cheap to paste into a prompt
+        record = {'n': row['name'], 'p': row['price'], 'sz': row['size'], 'up': row['unit_price'],
+                  'b': row['unit_price_basis'], 'c': row['category'], 'promo': row['promotion']}
+        return json.dumps({k: v for k, v in record.items() if v is not None}, ensure_ascii=False,
+                          separators=(',', ':'))
+
+
+class VoilaFocusedScraper:
+    def __init__(self, headless=True, extraction_engine="js", incremental=True, rate_limit=0.0,
+                 capture_network=False, capture_dir=None, fetch_engine="browser",
+                 http_concurrency=4, snapshot_dir=None, snapshot_every=0, history_db=None, lean=False,
+                 profile_dir=None, metrics=None, bounded_dom=False, output_dir=None):
+        self.run_started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.history = PriceHistoryStore(history_db) if history_db else None
+        self.progress_written = 0
+        self.metrics = metrics or RunMetrics()
+        self.lean = lean
+        self.bounded_dom = bounded_dom
+        self.profile_dir = profile_dir or (DEFAULT_PROFILE_DIR if lean else None)
+        # Every file a scrape writes lives under output_dir (default: the working directory)
+        self.output_dir = output_dir
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_every = snapshot_every
+        self.fetch_engine = fetch_engine
+        self.http_concurrency = http_concurrency
+        self.http_session = None
+        self.capture_network = capture_network
+        self.capture_dir = capture_dir
+        self.capture_url_pattern = re.compile(r"/api/|/products|/catalog|/search", re.IGNORECASE)
+        self.pending_captures = {}
+        self.discovered_endpoints = {}
+        self.headless = headless
+        self.extraction_engine = extraction_engine
+        self.incremental = incremental
+        self.rate_limit = rate_limit
+        self.last_request = 0.0
+        self.throttle_lock = threading.Lock()
+        self.write_progress_files = True
+
+        self.load_wait = AdaptiveWait(initial=5.0, cap=15.0)
+        self.scroll_wait = AdaptiveWait(initial=3.0, cap=8.0)
+
+        # Chrome is only launched the first time something actually needs a page
+        self._driver = None
+
+        self.products = ProductStore()
         self.max_retries = 2
+        self.merge_lock = threading.Lock()
+        self.ttl_overrides = {}
+        self.default_ttl = DEFAULT_TTL_HOURS
+        self.stale_reasons = {}
+        self.refresh_categories = set()
+        self.progress_rewrite = False
+        # Set when a scheduler gives up on this scraper's attempt; its thread may still be running
+        self.cancelled = threading.Event()
 
         self.target_categories = {
             "Fresh Fruits & Vegetables": "https://voila.ca/categories/fresh-fruits-vegetables/WEB1100606",
@@ -59,39 +1054,220 @@ class VoilaFocusedScraper:
             "Flyer Deals": "https://voila.ca/categories/flyer-deals/WEB19082285?source=navigation"
         }
 
-    def check_existing_files(self):
-        category_files = {}
-        for category_name in self.target_categories.keys():
-            safe_filename = re.sub(r'[^\w\-_\.]', '_', category_name.lower())
-            filename = f"voila_{safe_filename}.csv"
-            category_files[category_name] = filename
+    @property
+    def driver(self):
+        if self._driver is None:
+            self.start_browser()
+        return self._driver
+
+    def start_browser(self):
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        if self.headless:
+            chrome_options.add_argument("--headless")
+
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--disable-features=VizDisplayCompositor")
+        chrome_options.add_argument("--memory-pressure-off")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+
+        if self.profile_dir:
+            # A persistent profile keeps the HTTP cache and cookies warm between runs
+            chrome_options.add_argument(f"--user-data-dir={os.path.abspath(self.profile_dir)}")
+
+        if self.lean:
+            # DOMContentLoaded is enough: cards are rendered by script, not by the load event
+            chrome_options.page_load_strategy = "eager"
+            # Fonts have no content setting; they are dropped with BLOCKED_URL_PATTERNS instead
+            chrome_options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+            })
+
+        if self.capture_network:
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+        driver_path = resolve_chromedriver()
+        try:
+            self._driver = launch_chrome(driver_path, chrome_options)
+        except Exception as e:
+            if not driver_path:
+                raise
+            # A cached driver stops matching once Chrome updates itself, so resolve it again once
+            print(f"⚠️  ChromeDriver at {driver_path} failed to start ({e}), resolving again...")
+            self._driver = launch_chrome(resolve_chromedriver(refresh=True), chrome_options)
+
+        self.instrument_driver(self._driver)
+        self.driver.set_page_load_timeout(30)
+        self.driver.implicitly_wait(5)
+
+        try:
+            self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_JS})
+        except Exception as e:
+            print(f"⚠️  Network idle tracking unavailable, waits will rely on timeouts: {e}")
+
+        if self.capture_network or self.lean:
+            try:
+                self.driver.execute_cdp_cmd("Network.enable", {})
+            except Exception as e:
+                print(f"⚠️  Could not enable network domain: {e}")
+
+        if self.lean:
+            try:
+                self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            except Exception as e:
+                print(f"⚠️  Could not block non-essential resources: {e}")
+
+    def instrument_driver(self, driver):
+        from selenium.common.exceptions import NoSuchElementException
+
+        metrics = self.metrics
+        commands = metrics.command_counter()
+        original_execute = driver.execute
+
+        # WebElement commands also go through the driver's execute, so every round trip is counted here
+        def counted_execute(driver_command, params=None):
+            commands[driver_command] = commands.get(driver_command, 0) + 1
+            try:
+                return original_execute(driver_command, params)
+            except NoSuchElementException:
+                metrics.increment('find_element_failures')
+                raise
+
+        driver.execute = counted_execute
 
+    def record_browser_memory(self, category_name):
+        try:
+            self.metrics.record_memory(category_name, 'js_heap_peak_bytes',
+                                       self.driver.execute_script(BROWSER_MEMORY_JS))
+        except Exception:
+            pass
+
+        try:
+            import psutil
+            root = psutil.Process(self._driver.service.process.pid)
+            rss = sum(process.memory_info().rss for process in [root] + root.children(recursive=True))
+            self.metrics.record_memory(category_name, 'browser_rss_peak_bytes', rss)
+        except Exception:
+            pass
+
+    def write_metrics(self, path, metrics_format="json"):
+        try:
+            self.metrics.write(path, metrics_format)
+            print(f"📈 Metrics written to {path}")
+        except Exception as e:
+            print(f"⚠️  Could not write metrics: {e}")
+
+    def safe_category_name(self, category_name):
+        return re.sub(r'[^\w\-_\.]', '_', category_name.lower())
+
+    def output_path(self, name):
+        return os.path.join(self.output_dir, name) if self.output_dir else name
+
+    def category_filename(self, category_name):
+        return self.output_path(f"voila_{self.safe_category_name(category_name)}.csv")
+
+    def load_scrape_metadata(self):
+        metadata_file = self.output_path(SCRAPE_METADATA_FILE)
+        if not os.path.exists(metadata_file):
+            return {}
+        try:
+            with open(metadata_file, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Error loading scrape metadata: {e}")
+            return {}
+
+    def record_scrape_metadata(self, category_name, products):
+        with metadata_lock:
+            metadata = self.load_scrape_metadata()
+            entry = {'scraped_at': time.time(), 'products': products}
+            # Only TTLs chosen on the command line are pinned; the rest follow CATEGORY_TTL_HOURS
+            ttl = self.ttl_overrides.get(category_name, metadata.get(category_name, {}).get('ttl_hours'))
+            if ttl is not None:
+                entry['ttl_hours'] = ttl
+            metadata[category_name] = entry
+            metadata_file = self.output_path(SCRAPE_METADATA_FILE)
+            with open(metadata_file + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(metadata_file + ".tmp", metadata_file)
+
+    def category_ttl(self, category_name, metadata=None):
+        if category_name in self.ttl_overrides:
+            return self.ttl_overrides[category_name]
+        # A TTL set on an earlier run with --ttl stays with the category until overridden again
+        recorded = (metadata or {}).get(category_name, {}).get('ttl_hours')
+        if recorded is not None:
+            return recorded
+        return CATEGORY_TTL_HOURS.get(category_name, self.default_ttl)
+
+    def category_scraped_at(self, category_name, metadata=None):
+        entry = (metadata or {}).get(category_name)
+        if entry:
+            return entry['scraped_at']
+        # CSVs written before metadata was kept are dated by their modification time
+        filename = self.category_filename(category_name)
+        if not os.path.exists(filename):
+            return None
+        return os.path.getmtime(filename)
+
+    def category_age_hours(self, category_name, metadata=None):
+        scraped_at = self.category_scraped_at(category_name, metadata)
+        if scraped_at is None:
+            return None
+        return (time.time() - scraped_at) / 3600
+
+    def stale_reason(self, category_name, metadata=None):
+        if not os.path.exists(self.category_filename(category_name)):
+            return "missing"
+        age = self.category_age_hours(category_name, metadata)
+        ttl = self.category_ttl(category_name, metadata)
+        if age > ttl:
+            return f"stale: {age:.1f}h old, TTL {ttl:g}h"
+        return None
+
+    def check_existing_files(self):
+        metadata = self.load_scrape_metadata()
         existing_files = []
         missing_categories = []
+        self.stale_reasons = {}
 
-        for category_name, filename in category_files.items():
-            if os.path.exists(filename):
-                existing_files.append((category_name, filename))
+        # Categories whose CSV outlived their TTL are refreshed just like missing ones
+        for category_name in self.target_categories.keys():
+            reason = self.stale_reason(category_name, metadata)
+            if reason is None:
+                existing_files.append((category_name, self.category_filename(category_name)))
             else:
                 missing_categories.append(category_name)
+                self.stale_reasons[category_name] = reason
 
-        other_files = [
-            "voila_focused_groceries_progress.csv",
-            "voila_budget_items_progress.csv",
-            "voila_focused_groceries_FINAL.csv",
+        other_files = [self.output_path(name) for name in (
+            PROGRESS_FILE,
+            BUDGET_PROGRESS_FILE,
+            FINAL_FILE,
             "voila_budget_items_FINAL.csv"
-        ]
+        )]
         existing_other_files = [f for f in other_files if os.path.exists(f)]
+        existing_other_files.extend(sorted(glob.glob(os.path.join(self.output_path(PRODUCT_LOG_DIR), "*"))))
 
         return existing_files, missing_categories, existing_other_files
 
     def load_existing_products(self):
+        import pandas as pd
+
         print("Loading existing products from CSV files...")
 
-        if os.path.exists("voila_focused_groceries_progress.csv"):
+        progress_file = self.output_path(PROGRESS_FILE)
+        if os.path.exists(progress_file):
             try:
-                df = pd.read_csv("voila_focused_groceries_progress.csv")
-                self.products = df.to_dict('records')
+                # The progress file is append-only; rows written twice are dropped by the store
+                df = pd.read_csv(progress_file)
+                self.products = ProductStore()
+                self.products.extend(df.to_dict('records'))
+                self.progress_written = len(self.products)
                 print(f"✅ Loaded {len(self.products)} existing products from progress file")
                 return
             except Exception as e:
@@ -111,6 +1287,29 @@ class VoilaFocusedScraper:
         if self.products:
             print(f"📊 Total loaded: {len(self.products)} products")
 
+    def continue_with(self, categories):
+        self.load_existing_products()
+        # Stale rows stay in the store until a refresh of their category has actually been saved
+        self.refresh_categories = {category_name for category_name in categories
+                                   if self.products.count(category_name)}
+        return categories
+
+    def detach_stale_category(self, category_name):
+        if category_name not in self.refresh_categories:
+            return []
+        self.refresh_categories.discard(category_name)
+        stale = self.products.category_products(category_name)
+        self.products.remove_category(category_name)
+        # Rows already on disk are being replaced, so the append-only progress files need one full rewrite
+        self.progress_rewrite = True
+        return stale
+
+    def restore_stale_category(self, category_name, stale):
+        print(f"♻️  Refresh of {category_name} failed; keeping its {len(stale)} previous products")
+        self.products.remove_category(category_name)
+        self.products.extend(stale)
+        self.refresh_categories.add(category_name)
+
     def auto_continue_from_existing(self):
         existing_files, missing_categories, other_files = self.check_existing_files()
 
@@ -128,18 +1327,17 @@ class VoilaFocusedScraper:
                 print(f"  - {category_name}: {filename}")
 
         if missing_categories:
-            print(f"\n🔄 Auto-continuing with {len(missing_categories)} missing categories:")
+            print(f"\n🔄 Auto-continuing with {len(missing_categories)} missing or stale categories:")
             for category in missing_categories:
-                print(f"  - {category}")
+                print(f"  - {category} ({self.stale_reasons[category]})")
 
-            self.load_existing_products()
-            return missing_categories
+            return self.continue_with(missing_categories)
         else:
             print("\n✅ All categories appear to be complete!")
             return []
 
     def is_auto_restart(self):
-        return len(sys.argv) > 1 and sys.argv[1] == "--auto-restart"
+        return "--auto-restart" in sys.argv[1:]
 
     def handle_existing_files(self):
         existing_files, missing_categories, other_files = self.check_existing_files()
@@ -163,16 +1361,16 @@ class VoilaFocusedScraper:
                 print(f"  - {filename}")
 
         if missing_categories:
-            print(f"\n❌ Missing categories ({len(missing_categories)}):")
+            print(f"\n❌ Missing or stale categories ({len(missing_categories)}):")
             for category in missing_categories:
-                print(f"  - {category}")
+                print(f"  - {category} ({self.stale_reasons[category]})")
         else:
             print("\n✅ All categories appear to be complete!")
 
         print("\n" + "=" * 60)
         print("CHOOSE AN OPTION:")
         print("=" * 60)
-        print("1. Continue from missing categories only")
+        print("1. Scrape missing and stale categories only")
         print("2. Delete all files and start completely fresh")
         print("3. Exit (do nothing)")
 
@@ -181,9 +1379,8 @@ class VoilaFocusedScraper:
 
             if choice == '1':
                 if missing_categories:
-                    print(f"\n🔄 Continuing with {len(missing_categories)} missing categories...")
-                    self.load_existing_products()
-                    return missing_categories
+                    print(f"\n🔄 Continuing with {len(missing_categories)} missing or stale categories...")
+                    return self.continue_with(missing_categories)
                 else:
                     print("\n✅ All categories complete! Nothing to scrape.")
                     return []
@@ -215,73 +1412,781 @@ class VoilaFocusedScraper:
             else:
                 print("❌ Invalid choice. Please enter 1, 2, or 3.")
 
+    def parse_card_fields(self, category_name, text, price_text, promo_text):
+        text = (text or '').strip()
+        if len(text) < 10:
+            return None
+
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        if len(lines) < 1:
+            return None
+
+        name = None
+        for line in lines:
+            skip_terms = ['add', 'cart', 'price']
+            if len(line) > 2 and not any(skip in line.lower() for skip in skip_terms):
+                name = line
+                break
+
+        if not name:
+            return None
+
+        price = 0.0
+        try:
+            price_text = (price_text or '').strip()
+            if price_text.startswith('$'):
+                price = float(price_text[1:])
+        except Exception:
+            price = 0.0
+
+        size = 'Unknown'
+        for line in lines:
+            size_match = SIZE_PATTERN.search(line)
+            if size_match:
+                size = size_match.group(1)
+                break
+
+        promotion = promo_text.strip() if promo_text is not None else None
+
+        return {
+            'name': name,
+            'price': price,
+            'size': size,
+            'unit_price': None,
+            'category': category_name,
+            'has_price': price > 0,
+            'promotion': promotion
+        }
+
+    def add_product(self, product):
+        return self.products.add(product)
+
     def fast_process_products(self, category_name, cards):
+        if self.extraction_engine == "js":
+            return self.js_process_products(category_name, cards)
+        return self.webdriver_process_products(category_name, cards)
+
+    def js_process_products(self, category_name, cards):
+        if not cards:
+            return 0
+
+        # One round trip for every card instead of text + two lookups per card
+        records = self.driver.execute_script(CARD_EXTRACTION_JS, cards)
+        return self.process_card_records(category_name, records)
+
+    def process_card_records(self, category_name, records):
         new_products = 0
 
-        for card in cards:
+        for record in records or []:
             try:
-                text = card.text.strip()
-                if len(text) < 10:
-                    continue
+                product = self.parse_card_fields(category_name, record.get('text'),
+                                                 record.get('price_text'), record.get('promo_text'))
+                if product and self.add_product(product):
+                    new_products += 1
+            except Exception:
+                continue
 
-                lines = [line.strip() for line in text.split('\n') if line.strip()]
-                if len(lines) < 1:
-                    continue
+        return new_products
 
-                name = None
-                for line in lines:
-                    skip_terms = ['add', 'cart', 'price']
-                    if len(line) > 2 and not any(skip in line.lower() for skip in skip_terms):
-                        name = line
-                        break
+    def process_new_cards(self, category_name):
+        # Only cards without the watermark attribute are fetched, so each pass costs O(new cards)
+        if self.extraction_engine == "js":
+            with self.metrics.phase('extraction', category_name):
+                records = self.driver.execute_script(NEW_CARD_EXTRACTION_JS, PRODUCT_CARD_SELECTOR,
+                                                     CARD_WATERMARK_ATTR)
+                return self.process_card_records(category_name, records)
+
+        with self.metrics.phase('card_fetch', category_name):
+            cards = self.driver.execute_script(FIND_CARDS_JS, PRODUCT_CARD_SELECTOR, UNSEEN_CARD_FILTER)
+            if not cards:
+                return 0
+        with self.metrics.phase('extraction', category_name):
+            parsed = []
+            new_products = self.webdriver_process_products(category_name, cards, parsed)
+            # Placeholders that did not parse stay unmarked and are fetched again on a later pass
+            if parsed:
+                self.driver.execute_script(MARK_CARDS_SEEN_JS, parsed, CARD_WATERMARK_ATTR)
+            return new_products
+
+    def webdriver_process_products(self, category_name, cards, parsed=None):
+        from selenium.webdriver.common.by import By
+
+        new_products = 0
 
-                if not name or name in self.seen_product_names:
+        for card in cards:
+            try:
+                text = card.text.strip()
+                preview = self.parse_card_fields(category_name, text, None, None)
+                if not preview:
+                    continue
+                if parsed is not None:
+                    parsed.append(card)
+                if self.products.contains(preview):
                     continue
 
                 # Extract price directly from span with data-test='fop-price'
-                price = 0.0
                 try:
-                    price_element = card.find_element(By.CSS_SELECTOR, "span[data-test='fop-price']")
-                    price_text = price_element.text.strip()
-                    if price_text.startswith('$'):
-                        price = float(price_text[1:])
+                    price_text = card.find_element(By.CSS_SELECTOR, "span[data-test='fop-price']").text
                 except Exception:
-                    price = 0.0
-
-                size = 'Unknown'
-                for line in lines:
-                    size_match = re.search(r'(\d+(?:\.\d+)?\s*(?:g|kg|lb|oz|ml|l|pack|ct|count|each|pc|lbs))', line,
-                                           re.IGNORECASE)
-                    if size_match:
-                        size = size_match.group(1)
-                        break
+                    price_text = None
 
-                promotion = None
                 try:
-                    promo_elem = card.find_element(By.CSS_SELECTOR, "span[data-test='fop-offer-text']")
-                    promotion = promo_elem.text.strip()
+                    promo_text = card.find_element(By.CSS_SELECTOR, "span[data-test='fop-offer-text']").text
                 except Exception:
-                    promotion = None
-
-                product = {
-                    'name': name,
-                    'price': price,
-                    'size': size,
-                    'unit_price': None,
-                    'category': category_name,
-                    'has_price': price > 0,
-                    'promotion': promotion
-                }
-
-                self.products.append(product)
-                self.seen_product_names.add(name)
-                new_products += 1
+                    promo_text = None
+
+                product = self.parse_card_fields(category_name, text, price_text, promo_text)
+                if product and self.add_product(product):
+                    new_products += 1
+
+            except Exception:
+                continue
+
+        return new_products
+
+    def payload_text(self, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value.strip() or None
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, dict):
+            for key in ['value', 'description', 'text', 'label', 'name', 'displayText']:
+                if value.get(key):
+                    return self.payload_text(value[key])
+        if isinstance(value, list) and value:
+            return self.payload_text(value[0])
+        return None
+
+    def payload_price(self, value):
+        if value is None or isinstance(value, bool):
+            return 0.0
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            match = re.search(r'\d+(?:\.\d+)?', value.replace(',', ''))
+            return float(match.group(0)) if match else 0.0
+        if isinstance(value, dict):
+            for key in ['current', 'amount', 'value', 'price', 'salePrice', 'regular']:
+                if key in value:
+                    price = self.payload_price(value[key])
+                    if price > 0:
+                        return price
+        return 0.0
+
+    def map_product_payload(self, item, category_name):
+        name = self.payload_text(item.get('name'))
+        if not name:
+            return None
+
+        price = 0.0
+        for key in ['price', 'prices', 'pricing', 'currentPrice']:
+            if key in item:
+                price = self.payload_price(item[key])
+                break
+
+        size = None
+        for key in ['size', 'packSize', 'packSizeDescription', 'displaySize', 'weight']:
+            size = self.payload_text(item.get(key))
+            if size:
+                break
+
+        promotion = None
+        for key in ['promotions', 'promotion', 'offers', 'offer']:
+            promotion = self.payload_text(item.get(key))
+            if promotion:
+                break
+
+        return {
+            'name': name,
+            'price': price,
+            'size': size or 'Unknown',
+            'unit_price': None,
+            'category': category_name,
+            'has_price': price > 0,
+            'promotion': promotion
+        }
+
+    def iter_payload_products(self, node):
+        # Anything carrying a name and some kind of price is treated as a product record
+        if isinstance(node, dict):
+            if isinstance(node.get('name'), str) and any(
+                    key in node for key in ['price', 'prices', 'pricing', 'currentPrice']):
+                yield node
+                return
+            for value in node.values():
+                yield from self.iter_payload_products(value)
+        elif isinstance(node, list):
+            for value in node:
+                yield from self.iter_payload_products(value)
+
+    def process_payload(self, category_name, payload):
+        new_products = 0
+        for item in self.iter_payload_products(payload):
+            try:
+                product = self.map_product_payload(item, category_name)
+                if product and self.add_product(product):
+                    new_products += 1
+            except Exception:
+                continue
+        return new_products
+
+    def record_capture(self, category_name, url, payload):
+        if not self.capture_dir:
+            return
 
+        category_dir = os.path.join(self.output_path(self.capture_dir), self.safe_category_name(category_name))
+        os.makedirs(category_dir, exist_ok=True)
+        capture_file = os.path.join(category_dir, f"{len(os.listdir(category_dir)):04d}.json")
+        with open(capture_file, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'payload': payload}, f)
+
+    def collect_network_products(self, category_name):
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            print(f"  ⚠️  Could not read network log: {e}")
+            return 0
+
+        finished = set()
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
             except Exception:
                 continue
 
+            params = message.get('params', {})
+            if message.get('method') == 'Network.responseReceived':
+                response = params.get('response', {})
+                if 'json' in response.get('mimeType', '') and self.capture_url_pattern.search(response.get('url', '')):
+                    self.pending_captures[params['requestId']] = response['url']
+            elif message.get('method') == 'Network.loadingFinished':
+                finished.add(params.get('requestId'))
+
+        new_products = 0
+        # Bodies are only available once loading has finished; the rest wait for the next pass
+        for request_id in [r for r in self.pending_captures if r in finished]:
+            url = self.pending_captures.pop(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                text = body['body']
+                if body.get('base64Encoded'):
+                    text = base64.b64decode(text).decode('utf-8')
+                payload = json.loads(text)
+            except Exception:
+                continue
+
+            found = self.process_payload(category_name, payload)
+            if found:
+                self.discovered_endpoints.setdefault(category_name, [])
+                if url not in self.discovered_endpoints[category_name]:
+                    self.discovered_endpoints[category_name].append(url)
+            self.record_capture(category_name, url, payload)
+            new_products += found
+
         return new_products
 
+    def replay_captures(self, category_name, capture_dir=None):
+        category_dir = os.path.join(capture_dir or self.output_path(self.capture_dir),
+                                    self.safe_category_name(category_name))
+        new_products = 0
+        for capture_file in sorted(glob.glob(os.path.join(category_dir, "*.json"))):
+            with open(capture_file, encoding='utf-8') as f:
+                new_products += self.process_payload(category_name, json.load(f)['payload'])
+        return new_products
+
+    def extract_new_products(self, category_name):
+        if self.capture_network:
+            with self.metrics.phase('extraction', category_name):
+                return self.collect_network_products(category_name)
+        if self.incremental:
+            return self.process_new_cards(category_name)
+        # Re-fetch fresh product cards every scroll
+        with self.metrics.phase('card_fetch', category_name):
+            cards = self.driver.execute_script(FIND_CARDS_JS, PRODUCT_CARD_SELECTOR, None)
+        with self.metrics.phase('extraction', category_name):
+            return self.fast_process_products(category_name, cards)
+
+    def product_log_path(self, category_name):
+        return os.path.join(self.output_path(PRODUCT_LOG_DIR), f"{self.safe_category_name(category_name)}.jsonl")
+
+    def checkpoint_path(self, category_name):
+        return os.path.join(self.output_path(PRODUCT_LOG_DIR),
+                            f"{self.safe_category_name(category_name)}.checkpoint.json")
+
+    def append_product_log(self, category_name, products):
+        if not products or self.cancelled.is_set():
+            return
+
+        os.makedirs(self.output_path(PRODUCT_LOG_DIR), exist_ok=True)
+        with open(self.product_log_path(category_name), 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(product) + '\n' for product in products))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_checkpoint(self, category_name, scroll_count, card_count, products_collected):
+        if self.cancelled.is_set():
+            return
+
+        checkpoint = {
+            'category': category_name,
+            'scroll_count': scroll_count,
+            'cards': card_count,
+            'products_collected': products_collected,
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        # Write-then-rename so a crash never leaves a half-written checkpoint behind
+        os.makedirs(self.output_path(PRODUCT_LOG_DIR), exist_ok=True)
+        checkpoint_file = self.checkpoint_path(category_name)
+        with open(checkpoint_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+    def load_checkpoint(self, category_name):
+        checkpoint_file = self.checkpoint_path(category_name)
+        if not os.path.exists(checkpoint_file):
+            return None
+        try:
+            with open(checkpoint_file, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable checkpoint {checkpoint_file}: {e}")
+            return None
+
+    def load_product_log(self, category_name):
+        log_file = self.product_log_path(category_name)
+        if not os.path.exists(log_file):
+            return 0
+
+        loaded = 0
+        with open(log_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    product = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if product.get('name') and self.add_product(product):
+                    loaded += 1
+        return loaded
+
+    def clear_product_log(self, category_name):
+        if self.cancelled.is_set():
+            return
+        for path in [self.product_log_path(category_name), self.checkpoint_path(category_name)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def fast_forward(self, checkpoint, category_name, payload_baseline):
+        # Re-load the cards seen before the crash; their products are already restored from the log
+        print(f"⏩ Resuming from scroll {checkpoint['scroll_count']} ({checkpoint['cards']} cards)...")
+        misses = 0
+        while misses < 3:
+            before = self.driver.execute_script(SCROLL_TO_BOTTOM_JS, PRODUCT_CARD_SELECTOR)
+            if before['cards'] >= checkpoint['cards']:
+                break
+            page_grew, _ = self.wait_for_page_growth(before['cards'], before['height'], self.scroll_wait)
+            misses = 0 if page_grew else misses + 1
+            if page_grew and self.bounded_dom:
+                # Replayed cards are watermarked (duplicates are dropped) so they can be hollowed as we go
+                self.extract_new_products(category_name)
+                self.hollow_extracted_cards(category_name, checkpoint['scroll_count'], payload_baseline)
+
+    def hollow_extracted_cards(self, category_name, scroll_count, payload_baseline):
+        if not self.bounded_dom:
+            return 0
+
+        if self.capture_network:
+            # Cards are only disposable once payloads carry the products; until then they are the fallback
+            if self.products.count(category_name) == payload_baseline:
+                return 0
+            watermark = None
+        elif self.incremental:
+            watermark = CARD_WATERMARK_ATTR
+        else:
+            # Full re-extraction reads every card on every scroll and never stamps a watermark
+            return 0
+        args = (PRODUCT_CARD_SELECTOR, watermark, HOLLOW_ATTR, DOM_KEEP_CARDS, DOM_KEEP_CARDS)
+
+        with self.metrics.phase('hollow', category_name):
+            if self.snapshot_dir:
+                # Hollowed cards vanish from page_source, so snapshot them while they are still there
+                if self.driver.execute_script(HOLLOW_CARDS_JS, *args, True) < DOM_KEEP_CARDS:
+                    return 0
+                self.save_snapshot(category_name, scroll_count)
+            hollowed = self.driver.execute_script(HOLLOW_CARDS_JS, *args, False)
+
+        if hollowed:
+            self.metrics.increment('cards_hollowed', hollowed, category_name)
+        return hollowed
+
+    def save_snapshot(self, category_name, scroll_count):
+        if not self.snapshot_dir or self.cancelled.is_set():
+            return
+
+        category_dir = os.path.join(self.output_path(self.snapshot_dir), self.safe_category_name(category_name))
+        os.makedirs(category_dir, exist_ok=True)
+        snapshot_file = os.path.join(category_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{scroll_count:04d}.html.gz")
+        try:
+            with gzip.open(snapshot_file, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(f"{SNAPSHOT_CATEGORY_MARKER}{category_name} -->\n")
+                f.write(self.driver.page_source)
+        except Exception as e:
+            print(f"  ⚠️  Could not save snapshot for {category_name}: {e}")
+
+    def parse_snapshots(self, snapshot_dir, processes=None):
+        paths = sorted(glob.glob(os.path.join(snapshot_dir, "**", "*.html.gz"), recursive=True))
+        if not paths:
+            print(f"No snapshots found in {snapshot_dir}")
+            return []
+
+        print(f"🧩 Parsing {len(paths)} snapshots with {processes or os.cpu_count()} processes...")
+        categories = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for path, (category_name, records) in zip(paths, executor.map(parse_snapshot_file, paths)):
+                if not category_name:
+                    print(f"  ⚠️  Skipping {path}: no category marker")
+                    continue
+                new_products = self.process_card_records(category_name, records)
+                print(f"  {os.path.basename(path)}: {new_products} new products in {category_name}")
+                if category_name not in categories:
+                    categories.append(category_name)
+
+        return categories
+
+    def load_discovered_endpoints(self):
+        endpoints_file = self.output_path(ENDPOINTS_FILE)
+        if not os.path.exists(endpoints_file):
+            return
+        try:
+            with open(endpoints_file, encoding='utf-8') as f:
+                for category_name, urls in json.load(f).items():
+                    known = self.discovered_endpoints.setdefault(category_name, [])
+                    known.extend(url for url in urls if url not in known)
+        except Exception as e:
+            print(f"⚠️  Error loading {ENDPOINTS_FILE}: {e}")
+
+    def save_discovered_endpoints(self):
+        if not self.discovered_endpoints:
+            return
+        with open(self.output_path(ENDPOINTS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.discovered_endpoints, f, indent=2)
+
+    def create_http_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        retry = Retry(total=4, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"], respect_retry_after_header=True)
+        # Keep-alive pool sized to the number of concurrent page fetches
+        adapter = HTTPAdapter(pool_connections=self.http_concurrency, pool_maxsize=self.http_concurrency,
+                              max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Accept": "application/json",
+        })
+
+        # Reuse the browser's store/session cookies when a browser is already running
+        if self._driver is not None:
+            try:
+                for cookie in self.driver.get_cookies():
+                    session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'))
+            except Exception:
+                pass
+
+        return session
+
+    def infer_listings(self, urls):
+        # Captured URLs for one listing share a path and parameter names and differ only in the paging value
+        groups = {}
+        for url in urls:
+            parts = urlsplit(url)
+            params = dict(parse_qsl(parts.query, keep_blank_values=True))
+            groups.setdefault((parts.scheme, parts.netloc, parts.path, tuple(sorted(params))), []).append(
+                (url, params))
+
+        listings = []
+        for group in groups.values():
+            names = set(group[0][1])
+            param = next((p for p in PAGE_PARAMS + OFFSET_PARAMS if p in names), None)
+            if param is None:
+                # No well-known name: use the one numeric parameter that changes between captures
+                varying = [name for name in names if len({params[name] for _, params in group}) > 1
+                           and all(params[name].isdigit() for _, params in group)]
+                param = varying[0] if len(varying) == 1 else None
+            if param is None or not all(params[param].isdigit() for _, params in group):
+                listings.extend({'url': url, 'param': None, 'start': 0, 'step': 0} for url, _ in group)
+                continue
+
+            listing_urls = {}
+            for url, params in group:
+                fixed = tuple(sorted((key, value) for key, value in params.items() if key != param))
+                listing_urls.setdefault(fixed, []).append((url, int(params[param])))
+
+            size_param = next((p for p in PAGE_SIZE_PARAMS if p in names), None)
+            for captures in listing_urls.values():
+                values = sorted({value for _, value in captures})
+                if param in OFFSET_PARAMS:
+                    page_size = group[0][1].get(size_param, '') if size_param else ''
+                    step = int(page_size) if page_size.isdigit() and int(page_size) else math.gcd(
+                        *[b - a for a, b in zip(values, values[1:])])
+                    # Captures start wherever scrolling began; the listing itself starts at offset 0
+                    start = values[0] % step if step else 0
+                else:
+                    step = 1
+                    start = min(values[0], 1)
+                if not step:
+                    listings.extend({'url': url, 'param': None, 'start': 0, 'step': 0} for url, _ in captures)
+                    continue
+                listings.append({'url': captures[0][0], 'param': param, 'start': start, 'step': step})
+        return listings
+
+    def listing_url(self, listing, page_index):
+        if listing['param'] is None:
+            return listing['url'] if page_index == 0 else None
+
+        parts = urlsplit(listing['url'])
+        value = str(listing['start'] + page_index * listing['step'])
+        query = [(key, value if key == listing['param'] else val)
+                 for key, val in parse_qsl(parts.query, keep_blank_values=True)]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def listing_info(self, payload):
+        # Totals and "more pages" flags sit near the top of the payload, next to the product list
+        info = {}
+        nodes = [payload]
+        for _ in range(3):
+            children = []
+            for node in nodes:
+                if not isinstance(node, dict):
+                    continue
+                for key, value in node.items():
+                    if isinstance(value, dict):
+                        children.append(value)
+                    elif key in LISTING_TOTAL_KEYS and isinstance(value, int) and 'total' not in info:
+                        info['total'] = value
+                    elif key in LISTING_PAGES_KEYS and isinstance(value, int) and 'pages' not in info:
+                        info['pages'] = value
+                    elif key in LISTING_MORE_KEYS and isinstance(value, bool) and 'more' not in info:
+                        info['more'] = value == LISTING_MORE_KEYS[key]
+            nodes = children
+        return info
+
+    def fetch_json(self, url):
+        self.throttle()
+        response = self.http_session.get(url, timeout=20)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_page_range(self, listing, first_page, last_page):
+        # Each fetch worker walks its own contiguous page range and stops early if the listing ends sooner
+        payloads = []
+        for page_index in range(first_page, last_page):
+            if self.cancelled.is_set():
+                break
+            payload = self.fetch_json(self.listing_url(listing, page_index))
+            if not any(True for _ in self.iter_payload_products(payload)):
+                break
+            payloads.append(payload)
+        return payloads
+
+    def fetch_listing(self, category_name, listing):
+        first = self.fetch_json(self.listing_url(listing, 0))
+        page_size = sum(1 for _ in self.iter_payload_products(first))
+        if not page_size:
+            return 0
+        new_products = self.process_payload(category_name, first)
+        info = self.listing_info(first)
+        if listing['param'] is None or info.get('more') is False:
+            return new_products
+
+        pages = info.get('pages')
+        if pages is None and info.get('total') is not None:
+            # Offset listings step by items; page listings by pages of the first page's size
+            per_page = listing['step'] if listing['step'] > 1 else page_size
+            pages = -(-info['total'] // per_page)
+
+        if pages is not None:
+            if pages <= 1:
+                return new_products
+            # The listing size is known up front, so the remaining pages are split into one range per worker
+            workers = max(1, min(self.http_concurrency, pages - 1))
+            bounds = [1 + (pages - 1) * i // workers for i in range(workers + 1)]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                ranges = list(executor.map(lambda i: self.fetch_page_range(listing, bounds[i], bounds[i + 1]),
+                                           range(workers)))
+            for payloads in ranges:
+                for payload in payloads:
+                    new_products += self.process_payload(category_name, payload)
+            print(f"  📄 Fetched {sum(map(len, ranges)) + 1}/{pages} pages in {workers} ranges")
+            return new_products
+
+        # Without a total, fetch ahead in batches until a short, empty or final page
+        page_index = 1
+        while not self.cancelled.is_set():
+            urls = [self.listing_url(listing, page_index + offset) for offset in range(self.http_concurrency)]
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                payloads = list(executor.map(self.fetch_json, urls))
+
+            for payload in payloads:
+                found = sum(1 for _ in self.iter_payload_products(payload))
+                if not found:
+                    return new_products
+                new_products += self.process_payload(category_name, payload)
+                if found < page_size or self.listing_info(payload).get('more') is False:
+                    return new_products
+            page_index += len(urls)
+        return new_products
+
+    def fetch_category_http(self, category_name):
+        endpoints = self.discovered_endpoints.get(category_name)
+        if not endpoints:
+            return None
+
+        if self.http_session is None:
+            self.http_session = self.create_http_session()
+
+        new_products = 0
+        for listing in self.infer_listings(endpoints):
+            if listing['param']:
+                print(f"  🔗 Paging {urlsplit(listing['url']).path} by '{listing['param']}' "
+                      f"from {listing['start']} in steps of {listing['step']}")
+            new_products += self.fetch_listing(category_name, listing)
+        return new_products
+
+    def scrape_category_http(self, category_name):
+        print(f"\n{'=' * 50}")
+        print(f"HTTP FETCH: {category_name}")
+        print(f"{'=' * 50}")
+
+        try:
+            with self.metrics.phase('http_fetch', category_name):
+                new_products = self.fetch_category_http(category_name)
+        except Exception as e:
+            self.metrics.increment('http_fetch_failures', category_name=category_name)
+            print(f"✗ HTTP fetch failed for {category_name}: {e}")
+            return False
+
+        if new_products is None:
+            print(f"  No known listing endpoint for {category_name}")
+            return False
+
+        print(f"✅ HTTP FETCH COMPLETE: Found {new_products} products in {category_name}")
+        self.metrics.increment('products', new_products, category_name)
+        with self.metrics.phase('save', category_name):
+            return self.save_category_results(category_name)
+
+    def run_category(self, category_name):
+        # Scraped into an empty partition so refreshed prices are not deduplicated against the stale ones
+        stale = self.detach_stale_category(category_name)
+        saved = self.scrape_with_engines(category_name)
+        if stale and not saved:
+            self.restore_stale_category(category_name, stale)
+        return saved
+
+    def scrape_with_engines(self, category_name):
+        if self.fetch_engine == "http" and self.scrape_category_http(category_name):
+            return True
+
+        if self.cancelled.is_set():
+            return False
+        if self.fetch_engine == "http":
+            print(f"  🌐 Falling back to the browser for {category_name}")
+        return self.scrape_category(category_name, self.target_categories[category_name])
+
+    def record_load_stats(self, category_name, seconds, products):
+        try:
+            stats = self.driver.execute_script(PAGE_LOAD_STATS_JS)
+        except Exception as e:
+            print(f"  ⚠️  Could not read page load stats: {e}")
+            return
+
+        mode = "lean" if self.lean else "full"
+        current = {
+            'bytes': stats['transferred'],
+            'requests': stats['requests'],
+            'dom_ready_ms': stats['dom_ready_ms'],
+            'seconds': round(seconds, 2),
+            'products': products,
+            # Responses served from a persistent profile's cache report a transferSize of 0
+            'warm_cache': bool(self.profile_dir),
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        load_stats_file = self.output_path(LOAD_STATS_FILE)
+        with load_stats_lock:
+            all_stats = {}
+            if os.path.exists(load_stats_file):
+                try:
+                    with open(load_stats_file, encoding='utf-8') as f:
+                        all_stats = json.load(f)
+                except Exception:
+                    all_stats = {}
+            category_stats = all_stats.setdefault(category_name, {})
+            category_stats[mode] = current
+            with open(load_stats_file, 'w', encoding='utf-8') as f:
+                json.dump(all_stats, f, indent=2)
+
+        print(f"  📦 {mode} profile: {current['bytes'] / 1024 / 1024:.1f} MB over {current['requests']} requests, "
+              f"{current['seconds']:.1f}s")
+
+        # Savings are reported against the last measurement taken with the full profile
+        baseline = category_stats.get("full")
+        if self.lean and baseline:
+            saved_mb = (baseline['bytes'] - current['bytes']) / 1024 / 1024
+            saved_seconds = baseline['seconds'] - current['seconds']
+            print(f"  💡 Saved {saved_mb:.1f} MB and {saved_seconds:.1f}s vs the full profile "
+                  f"({baseline['recorded_at']})")
+            if current['warm_cache'] != baseline.get('warm_cache', False):
+                print("     Only one of these runs used a persistent profile, so cache hits count as saved "
+                      "bytes too; compare both with or without --profile-dir to isolate blocking")
+
+    def throttle(self):
+        # Per-worker rate limit: keep at least rate_limit seconds between requests, even from fetch threads
+        if self.rate_limit <= 0:
+            return
+        with self.throttle_lock:
+            now = time.time()
+            slot = max(now, self.last_request + self.rate_limit)
+            self.last_request = slot
+        if slot > now:
+            time.sleep(slot - now)
+
+    def navigate(self, url):
+        self.throttle()
+        self.driver.get(url)
+
+    def wait_for_page_growth(self, previous_cards, previous_height, adaptive_wait):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        condition = page_grew_or_went_idle(previous_cards, previous_height)
+        started = time.time()
+
+        try:
+            WebDriverWait(self.driver, adaptive_wait.timeout(), poll_frequency=0.1).until(condition)
+        except TimeoutException:
+            pass
+
+        if condition.grew:
+            adaptive_wait.record(time.time() - started)
+
+        return condition.grew, condition.state
+
+    def wait_for_page_load(self):
+        grew, state = self.wait_for_page_growth(0, None, self.load_wait)
+        return state
+
     def scrape_category(self, category_name, category_url):
         print(f"\n{'=' * 50}")
         print(f"FAST SCRAPING: {category_name}")
@@ -289,36 +2194,71 @@ class VoilaFocusedScraper:
         print(f"{'=' * 50}")
 
         try:
-            self.driver.get(category_url)
-            time.sleep(2)
+            if self.capture_network:
+                # Drop log entries from the previous page; their bodies are gone after navigation
+                self.driver.get_log("performance")
+                self.pending_captures = {}
+
+            category_started = time.time()
+            # Products restored from the log came from payloads too, so they count as payloads seen
+            payload_baseline = self.products.count(category_name)
+            checkpoint = self.load_checkpoint(category_name)
+            if checkpoint:
+                restored = self.load_product_log(category_name)
+                print(f"♻️  Restored {restored} logged products for {category_name}")
+            else:
+                self.clear_product_log(category_name)
 
-            initial_count = len(self.products)
+            with self.metrics.phase('navigation', category_name):
+                self.navigate(category_url)
+                self.wait_for_page_load()
 
-            print(f"Starting infinite scroll for ALL products...")
+            initial_count = self.products.count(category_name)
 
-            products_collected = 0
             scroll_count = 0
             no_growth_count = 0
 
-            while scroll_count < 100 and products_collected < 1000:
-                current_height = self.driver.execute_script("return document.body.scrollHeight")
+            if checkpoint:
+                self.fast_forward(checkpoint, category_name, payload_baseline)
+                scroll_count = checkpoint['scroll_count']
 
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(1.5)  # Wait longer for lazy loading
-
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
-                page_grew = new_height > current_height
+            print(f"Starting infinite scroll for ALL products...")
+            logged = len(self.products)
+
+            scroll_cap, product_cap = ((BOUNDED_SCROLL_CAP, BOUNDED_PRODUCT_CAP) if self.bounded_dom
+                                       else (SCROLL_CAP, PRODUCT_CAP))
+            while scroll_count < scroll_cap and self.products.count(category_name) < product_cap:
+                if self.cancelled.is_set():
+                    break
+                with self.metrics.phase('scroll_wait', category_name):
+                    before = self.driver.execute_script(SCROLL_TO_BOTTOM_JS, PRODUCT_CARD_SELECTOR)
+
+                    # Returns as soon as new cards render or the network goes idle, capped by a learned timeout
+                    page_grew, _ = self.wait_for_page_growth(before['cards'], before['height'], self.scroll_wait)
                 scroll_count += 1
+                self.metrics.increment('scrolls', category_name=category_name)
+                if scroll_count % 10 == 0:
+                    self.record_browser_memory(category_name)
 
                 if page_grew:
                     try:
-                        # Re-fetch fresh product cards every scroll
-                        cards = self.driver.find_elements(By.CSS_SELECTOR, "[class*='product-card']")
-                        new_products = self.fast_process_products(category_name, cards)
-                        products_collected = len([p for p in self.products if p.get('category') == category_name])
+                        new_products = self.extract_new_products(category_name)
+                        products_collected = self.products.count(category_name)
                         print(
                             f"  Scroll {scroll_count}: Found {new_products} new products. Total: {products_collected}")
                         no_growth_count = 0
+
+                        # O(new rows): only products found on this scroll are appended to the log
+                        with self.metrics.phase('checkpoint', category_name):
+                            self.append_product_log(category_name, self.products.as_dicts(logged))
+                            logged = len(self.products)
+                            self.write_checkpoint(category_name, scroll_count, before['cards'], products_collected)
+
+                        if self.snapshot_every and scroll_count % self.snapshot_every == 0:
+                            with self.metrics.phase('snapshot', category_name):
+                                self.save_snapshot(category_name, scroll_count)
+
+                        self.hollow_extracted_cards(category_name, scroll_count, payload_baseline)
                     except Exception as e:
                         print(f"  Scroll {scroll_count}: Error processing products: {e}")
                 else:
@@ -327,52 +2267,105 @@ class VoilaFocusedScraper:
                     if no_growth_count >= 5:
                         print("  End of product list reached.")
                         break
+            else:
+                self.metrics.increment('scroll_cap_hits', category_name=category_name)
+                print(f"  ⚠️  Stopped at the scroll cap after {scroll_count} scrolls; the listing may be "
+                      f"truncated. Use --bounded-dom to scroll further, or --capture once and then "
+                      f"--fetch http to page through it without a cap.")
+
+            if self.cancelled.is_set():
+                print(f"  ⏹️  Attempt on {category_name} was cancelled; leaving its files to the retry")
+                return False
 
             # Final fetch & process to catch anything missed at bottom
             try:
-                final_cards = self.driver.find_elements(By.CSS_SELECTOR, "[class*='product-card']")
-                final_new = self.fast_process_products(category_name, final_cards)
-                final_total = len([p for p in self.products if p.get('category') == category_name])
+                final_new = self.extract_new_products(category_name)
+                if self.capture_network and self.products.count(category_name) == payload_baseline:
+                    print("  ⚠️  No product payloads captured, falling back to the rendered cards")
+                    final_new = self.process_new_cards(category_name)
+                final_total = self.products.count(category_name)
                 print(f"✅ INFINITE SCROLL COMPLETE: Found {final_total - initial_count} products in {category_name}")
             except Exception as e:
                 print(f"Error in final processing: {e}")
 
-            self.save_category_results(category_name)
+            with self.metrics.phase('checkpoint', category_name):
+                self.append_product_log(category_name, self.products.as_dicts(logged))
+            with self.metrics.phase('snapshot', category_name):
+                self.save_snapshot(category_name, scroll_count)
+            self.record_browser_memory(category_name)
+            self.record_load_stats(category_name, time.time() - category_started,
+                                   self.products.count(category_name))
+
+            with self.metrics.phase('save', category_name):
+                saved = self.save_category_results(category_name)
+            if saved:
+                self.clear_product_log(category_name)
+            self.metrics.increment('products', self.products.count(category_name) - initial_count, category_name)
+            return saved
 
         except Exception as e:
+            self.metrics.increment('category_errors', category_name=category_name)
             print(f"✗ Error scraping {category_name}: {e}")
+            return False
 
     def save_category_results(self, category_name):
+        import pandas as pd
+
+        if self.cancelled.is_set():
+            print(f"  ⏹️  Not saving {category_name}: this attempt was cancelled")
+            return False
+
         if not self.products:
             print(f"No products to save for {category_name}")
-            return
+            return False
 
-        category_products = [p for p in self.products if p['category'] == category_name]
+        category_products = self.products.category_products(category_name)
 
         if not category_products:
             print(f"No products found for {category_name}")
-            return
+            return False
 
-        df = pd.DataFrame(category_products)
-        df = df.drop_duplicates(subset=['name', 'price'])
+        df = normalize_unit_prices(pd.DataFrame(category_products, columns=PRODUCT_COLUMNS))
 
-        safe_filename = re.sub(r'[^\w\-_\.]', '_', category_name.lower())
-        category_file = f"voila_{safe_filename}.csv"
+        category_file = self.category_filename(category_name)
         df.to_csv(category_file, index=False)
 
         print(f"✅ Saved {len(df)} products from {category_name} to {category_file}")
+        self.record_scrape_metadata(category_name, len(df))
+
+        if self.write_progress_files:
+            self.save_progress_files()
 
-        all_df = pd.DataFrame(self.products)
-        all_df = all_df.drop_duplicates(subset=['name', 'price', 'category'])
-        all_df.to_csv("voila_focused_groceries_progress.csv", index=False)
+        return True
 
-        if 'price' in all_df.columns and all_df['price'].notna().any():
-            valid_prices = all_df[all_df['price'].notna()]
-            budget_items = valid_prices[valid_prices['price'] <= 5.0]
-            if len(budget_items) > 0:
-                budget_items.to_csv("voila_budget_items_progress.csv", index=False)
+    def save_progress_files(self):
+        import pandas as pd
+
+        progress_file = self.output_path(PROGRESS_FILE)
+        budget_progress_file = self.output_path(BUDGET_PROGRESS_FILE)
+        if self.progress_rewrite:
+            for filename in (progress_file, budget_progress_file):
+                if os.path.exists(filename):
+                    os.remove(filename)
+            self.progress_written = 0
+            self.progress_rewrite = False
+
+        # Append only the rows added since the last write instead of rewriting the whole file
+        new_rows = self.products.as_dicts(self.progress_written)
+        if not new_rows:
+            return
 
-        print(f"📊 Total products so far: {len(all_df)} across {len(all_df['category'].unique())} categories")
+        new_df = pd.DataFrame(new_rows, columns=PRODUCT_COLUMNS)
+        new_df.to_csv(progress_file, mode='a', header=not os.path.exists(progress_file), index=False)
+
+        valid_prices = new_df[new_df['price'].notna()]
+        budget_items = valid_prices[valid_prices['price'] <= 5.0]
+        if len(budget_items) > 0:
+            budget_items.to_csv(budget_progress_file, mode='a', header=not os.path.exists(budget_progress_file),
+                                index=False)
+
+        self.progress_written = len(self.products)
+        print(f"📊 Total products so far: {len(self.products)} across {len(self.products.categories())} categories")
 
     def scrape_all_target_categories(self, categories_to_scrape=None):
         if categories_to_scrape is None:
@@ -387,21 +2380,219 @@ class VoilaFocusedScraper:
 
         for category_name in categories_to_scrape:
             if category_name in self.target_categories:
-                category_url = self.target_categories[category_name]
-                self.scrape_category(category_name, category_url)
-                time.sleep(2)
+                self.run_category(category_name)
+                if self.capture_network:
+                    self.save_discovered_endpoints()
             else:
                 print(f"⚠️  Unknown category: {category_name}")
 
+    def spawn_worker(self, worker_id=1):
+        # Chrome locks its profile directory, so every worker gets its own
+        profile_dir = f"{self.profile_dir}-{worker_id}" if self.profile_dir else None
+        worker = VoilaFocusedScraper(headless=self.headless, extraction_engine=self.extraction_engine,
+                                     incremental=self.incremental, rate_limit=self.rate_limit,
+                                     capture_network=self.capture_network, capture_dir=self.capture_dir,
+                                     fetch_engine=self.fetch_engine,
+                                     http_concurrency=self.http_concurrency, snapshot_dir=self.snapshot_dir,
+                                     snapshot_every=self.snapshot_every, lean=self.lean, profile_dir=profile_dir,
+                                     metrics=self.metrics, bounded_dom=self.bounded_dom,
+                                     output_dir=self.output_dir)
+        worker.target_categories = self.target_categories
+        worker.ttl_overrides = self.ttl_overrides
+        worker.default_ttl = self.default_ttl
+        worker.discovered_endpoints = {name: list(urls) for name, urls in self.discovered_endpoints.items()}
+        # Only the coordinating scraper writes the shared progress files
+        worker.write_progress_files = False
+        return worker
+
+    def merge_products(self, products):
+        return self.products.extend(products)
+
+    def merge_worker_results(self, worker, saved=True):
+        products = []
+        for category_name in worker.products.categories():
+            if category_name in self.refresh_categories:
+                # A failed refresh must not mix partial results into the previous, complete listing
+                if not saved:
+                    print(f"♻️  Refresh of {category_name} failed; keeping its previous products")
+                    continue
+                self.detach_stale_category(category_name)
+            products.extend(worker.products.category_products(category_name))
+        merged = self.merge_products(products)
+        self.save_progress_files()
+        if worker.capture_network:
+            for name, urls in worker.discovered_endpoints.items():
+                known = self.discovered_endpoints.setdefault(name, [])
+                known.extend(url for url in urls if url not in known)
+            self.save_discovered_endpoints()
+        return merged
+
+    def category_worker(self, worker_id, work_queue, merge_lock):
+        try:
+            worker = self.spawn_worker(worker_id)
+        except Exception as e:
+            print(f"✗ Worker {worker_id} failed to start: {e}")
+            return
+
+        try:
+            while True:
+                try:
+                    category_name = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                print(f"👷 Worker {worker_id} taking {category_name}")
+                worker.products = ProductStore()
+                saved = worker.run_category(category_name)
+
+                with merge_lock:
+                    merged = self.merge_worker_results(worker, saved)
+                print(f"👷 Worker {worker_id} finished {category_name}: merged {merged} products")
+        finally:
+            worker.close()
+
+    def scrape_categories_parallel(self, categories_to_scrape, workers=2):
+        work_queue = queue.Queue()
+        for category_name in categories_to_scrape:
+            if category_name in self.target_categories:
+                work_queue.put(category_name)
+            else:
+                print(f"⚠️  Unknown category: {category_name}")
+
+        workers = max(1, min(workers, work_queue.qsize()))
+        print(f"\nStarting {workers} {self.fetch_engine} workers for {work_queue.qsize()} categories...")
+
+        merge_lock = threading.Lock()
+        threads = [threading.Thread(target=self.category_worker, args=(i + 1, work_queue, merge_lock), daemon=True)
+                   for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    async def run_scheduled(self, categories_to_scrape, concurrency=2, category_timeout=900.0, deadline=None,
+                            backoff=5.0):
+        loop = asyncio.get_running_loop()
+        # Spare threads so a timed-out job that is still unwinding never starves the next one
+        executor = ThreadPoolExecutor(max_workers=concurrency * 2)
+        job_queue = asyncio.Queue()
+        stop_at = loop.time() + deadline if deadline else None
+        results = {}
+        # The event loop only keeps weak references to tasks, so sleeping retries are held here
+        retries = set()
+
+        for category_name in categories_to_scrape:
+            if category_name in self.target_categories:
+                job_queue.put_nowait((category_name, 0))
+                results[category_name] = {'status': 'pending', 'attempts': 0, 'seconds': 0.0}
+            else:
+                print(f"⚠️  Unknown category: {category_name}")
+
+        async def requeue_later(job, delay):
+            await asyncio.sleep(delay)
+            await job_queue.put(job)
+            # The failed attempt only counts as done once its retry is queued, so join() keeps waiting
+            job_queue.task_done()
+
+        async def worker_loop(worker_id):
+            worker = self.spawn_worker(worker_id)
+            try:
+                while True:
+                    category_name, attempt = await job_queue.get()
+                    requeued = False
+                    result = results[category_name]
+                    try:
+                        remaining = stop_at - loop.time() if stop_at is not None else None
+                        if remaining is not None and remaining <= 0:
+                            result['status'] = 'skipped (deadline)'
+                            continue
+
+                        timeout = category_timeout if remaining is None else min(category_timeout, remaining)
+                        result['attempts'] = attempt + 1
+                        print(f"🗓️  Worker {worker_id} running {category_name} "
+                              f"(attempt {attempt + 1}/{self.max_retries + 1}, budget {timeout:.0f}s)")
+
+                        worker.products = ProductStore()
+                        started = loop.time()
+                        try:
+                            ok = await asyncio.wait_for(loop.run_in_executor(executor, worker.run_category,
+                                                                             category_name), timeout)
+                            error = None if ok else "no products saved"
+                        except asyncio.TimeoutError:
+                            ok, error = False, f"timed out after {timeout:.0f}s"
+                            # The abandoned thread keeps running, so stop it writing files the retry will own
+                            worker.cancelled.set()
+                            # Quitting the browser makes the stuck Selenium call fail so its thread can exit
+                            await loop.run_in_executor(None, worker.close)
+                            worker = self.spawn_worker(worker_id)
+                        except Exception as e:
+                            ok, error = False, str(e)
+                        result['seconds'] += loop.time() - started
+
+                        if ok:
+                            with self.merge_lock:
+                                merged = self.merge_worker_results(worker)
+                            result['status'] = 'done'
+                            print(f"✅ {category_name} done: merged {merged} products")
+                        elif attempt < self.max_retries:
+                            delay = backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+                            result['status'] = f'retrying ({error})'
+                            self.metrics.increment('category_retries', category_name=category_name)
+                            print(f"🔁 {category_name} failed ({error}); retrying in {delay:.0f}s")
+                            retry = asyncio.create_task(requeue_later((category_name, attempt + 1), delay))
+                            retries.add(retry)
+                            retry.add_done_callback(retries.discard)
+                            requeued = True
+                        else:
+                            result['status'] = f'failed ({error})'
+                            print(f"✗ {category_name} failed after {attempt + 1} attempts: {error}")
+                    finally:
+                        if not requeued:
+                            job_queue.task_done()
+            finally:
+                await loop.run_in_executor(None, worker.close)
+
+        workers = [asyncio.create_task(worker_loop(i + 1))
+                   for i in range(max(1, min(concurrency, job_queue.qsize())))]
+        try:
+            await job_queue.join()
+        finally:
+            for task in workers + list(retries):
+                task.cancel()
+            await asyncio.gather(*workers, *retries, return_exceptions=True)
+            executor.shutdown(wait=False)
+
+        print("\n🗓️  Schedule summary:")
+        for category_name, result in results.items():
+            print(f"  {category_name}: {result['status']} after {result['attempts']} attempt(s), "
+                  f"{result['seconds']:.0f}s")
+        return results
+
     def save_results(self):
+        import pandas as pd
+
         if not self.products:
             print("No products found to save!")
             return
 
-        df = pd.DataFrame(self.products)
-        df = df.drop_duplicates(subset=['name', 'price', 'category'])
-
-        df.to_csv("voila_focused_groceries_FINAL.csv", index=False)
+        df = normalize_unit_prices(pd.DataFrame(self.products.as_dicts(), columns=PRODUCT_COLUMNS))
+
+        run_id = None
+        if self.history:
+            # Categories carried over from earlier CSVs keep the time they were actually scraped
+            metadata = self.load_scrape_metadata()
+            scraped_at = {}
+            for category_name in df['category'].unique():
+                timestamp = self.category_scraped_at(category_name, metadata)
+                if timestamp is not None:
+                    scraped_at[category_name] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+            # The CSV outputs become exports of this run from the history store
+            run_id = self.history.record_run(df.to_dict('records'), self.run_started_at, scraped_at=scraped_at)
+            self.history.export_csv(run_id, self.output_path(FINAL_FILE))
+            print(f"\n🗄️  Recorded run {run_id} in {self.history.path}")
+        else:
+            df.to_csv(self.output_path(FINAL_FILE), index=False)
         print(f"\n🎉 FINAL RESULTS: Saved {len(df)} products to voila_focused_groceries_FINAL.csv")
 
         print("\n📊 FINAL Category Summary:")
@@ -419,7 +2610,11 @@ class VoilaFocusedScraper:
 
                 budget_items = valid_prices[valid_prices['price'] <= 5.0]
                 if len(budget_items) > 0:
-                    budget_items.to_csv("voila_budget_items_FINAL.csv", index=False)
+                    if run_id is not None:
+                        self.history.export_csv(run_id, self.output_path("voila_budget_items_FINAL.csv"),
+                                                max_price=5.0)
+                    else:
+                        budget_items.to_csv(self.output_path("voila_budget_items_FINAL.csv"), index=False)
                     print(f"  Budget items (≤$5): {len(budget_items)} saved to voila_budget_items_FINAL.csv")
 
         print(f"\n📁 Files created:")
@@ -430,17 +2625,494 @@ class VoilaFocusedScraper:
 
     def close(self):
         try:
-            self.driver.quit()
+            if self._driver:
+                self._driver.quit()
         except:
             pass
 
+        if self.history:
+            self.history.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Voila Focused Grocery Scraper")
+    parser.add_argument("--auto-restart", action="store_true",
+                        help="Continue with missing categories without prompting")
+    parser.add_argument("--headless", action="store_true", help="Run Chrome without a window")
+    parser.add_argument("--engine", choices=["js", "webdriver"], default="js",
+                        help="Card extraction engine (default: js)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of browser workers scraping categories in parallel (default: 1)")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Run categories as asyncio jobs with retries, backoff and deadlines")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries per failed category with --schedule (default: 2)")
+    parser.add_argument("--backoff", type=float, default=5.0,
+                        help="Base retry delay in seconds, doubled on each attempt (default: 5)")
+    parser.add_argument("--category-timeout", type=float, default=900.0,
+                        help="Time budget per category attempt with --schedule or --worker, in seconds "
+                             "(default: 900)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Stop starting new category attempts after this many seconds")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Minimum seconds between page loads or HTTP requests for each worker, "
+                             "across its --http-concurrency threads (default: 0)")
+    parser.add_argument("--fetch", choices=["browser", "http"], default="browser",
+                        help="Fetch listings through Chrome, or page through known JSON endpoints over HTTP "
+                             "(endpoints are discovered with --capture; Chrome is the fallback)")
+    parser.add_argument("--http-concurrency", type=int, default=4,
+                        help="Concurrent page fetches per worker with --fetch http (default: 4)")
+    parser.add_argument("--lean", action="store_true",
+                        help="Block images, fonts and trackers, use the eager load strategy and a persistent profile")
+    parser.add_argument("--bounded-dom", action="store_true",
+                        help=f"Hollow out extracted product cards while scrolling, keeping the last "
+                             f"{DOM_KEEP_CARDS}, so browser memory stays flat on long categories; also raises "
+                             f"the scroll cap from {SCROLL_CAP} scrolls/{PRODUCT_CAP} products to "
+                             f"{BOUNDED_SCROLL_CAP}/{BOUNDED_PRODUCT_CAP}")
+    parser.add_argument("--profile-dir",
+                        help=f"Chrome profile/cache directory kept between runs (default with --lean: "
+                             f"{DEFAULT_PROFILE_DIR})")
+    parser.add_argument("--metrics-file",
+                        help="Where to write run metrics (default: voila_metrics_<start time>.json or .prom)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json",
+                        help="Metrics file format: JSON or a Prometheus textfile (default: json)")
+    parser.add_argument("--no-metrics", action="store_true", help="Do not write a metrics file")
+    parser.add_argument("--capture", action="store_true",
+                        help="Read products from the storefront's JSON responses instead of the rendered cards")
+    parser.add_argument("--capture-dir", help="Save captured product payloads under this directory")
+    parser.add_argument("--replay-dir",
+                        help="Rebuild results from payloads saved with --capture-dir without starting a browser")
+    parser.add_argument("--snapshot-dir", help="Save compressed page snapshots for offline parsing here")
+    parser.add_argument("--snapshot-every", type=int, default=0,
+                        help="Also snapshot every N scrolls (default: only at the end of each category)")
+    parser.add_argument("--parse-snapshots", metavar="DIR",
+                        help="Parse saved snapshots into the usual CSV files without starting a browser")
+    parser.add_argument("--parse-processes", type=int, default=None,
+                        help="Processes used by --parse-snapshots (default: one per CPU)")
+    parser.add_argument("--history-db", default=HISTORY_DB,
+                        help=f"SQLite price-history store each run is recorded in (default: {HISTORY_DB})")
+    parser.add_argument("--no-history", action="store_true", help="Do not record this run in the history store")
+    parser.add_argument("--history-report", choices=["price-changes", "new", "removed", "promotions", "all"],
+                        help="Compare two recorded runs and exit")
+    parser.add_argument("--compare-runs", nargs=2, type=int, metavar=("OLD", "NEW"),
+                        help="Run ids for --history-report (default: the two most recent runs)")
+    parser.add_argument("--export-run", type=int, metavar="RUN_ID",
+                        help="Re-export the FINAL and budget CSVs for a recorded run and exit")
+    parser.add_argument("--status", action="store_true",
+                        help="List which categories are complete without starting Chrome and exit")
+    parser.add_argument("--category", action="append", metavar="NAME=URL",
+                        help="Scrape this category instead of the built-in list (repeatable)")
+    parser.add_argument("--query", action="store_true",
+                        help="Query the scraped products and print matches as compact JSONL, then exit")
+    parser.add_argument("--query-source", default="history",
+                        help="'history' for the latest run in --history-db, or a CSV to load and index "
+                             "for this one query (default: history)")
+    parser.add_argument("--in-category", action="append", metavar="NAME",
+                        help="Only match products in this category (repeatable)")
+    parser.add_argument("--group", choices=sorted(CATEGORY_GROUPS),
+                        help="Only match products in a group of categories, e.g. protein")
+    parser.add_argument("--sort-by", choices=["unit_price", "price"], default="unit_price",
+                        help="Order matches by unit price or shelf price (default: unit_price)")
+    parser.add_argument("--unit-basis", choices=sorted(set(UNIT_PRICE_BASIS.values())),
+                        default=UNIT_PRICE_BASIS['g'],
+                        help=f"Unit price basis compared by --sort-by unit_price "
+                             f"(default: {UNIT_PRICE_BASIS['g']})")
+    parser.add_argument("--max-price", type=float, help="Only match products at or under this shelf price")
+    parser.add_argument("--max-unit-price", type=float, help="Only match products at or under this unit price")
+    parser.add_argument("--on-promotion", action="store_true", help="Only match products with a promotion")
+    parser.add_argument("--top", type=int, default=20, help="Maximum number of matches to print (default: 20)")
+    parser.add_argument("--stores", metavar="FILE",
+                        help="JSON file mapping store names to {category: url} for --enqueue "
+                             "(default: the built-in categories as one store)")
+    parser.add_argument("--queue-db", default=QUEUE_DB,
+                        help=f"SQLite work queue shared by --enqueue and --worker; for several machines put it "
+                             f"and --history-db on a share with working file locks (default: {QUEUE_DB})")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Queue every (store, category) job as a new history run and exit")
+    parser.add_argument("--worker", action="store_true",
+                        help="Lease jobs from --queue-db without prompting until the queue is drained; "
+                             "results go to --history-db")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"How long a job lease lasts between heartbeats (default: {DEFAULT_LEASE_SECONDS})")
+    parser.add_argument("--queue-status", action="store_true", help="Show the work queue and exit")
+    parser.add_argument("--ttl", action="append", metavar="NAME=HOURS",
+                        help="Refresh this category once its data is older than HOURS; remembered for later runs "
+                             "(repeatable)")
+    parser.add_argument("--default-ttl", type=float, default=DEFAULT_TTL_HOURS,
+                        help=f"Refresh categories without their own TTL after this many hours "
+                             f"(default: {DEFAULT_TTL_HOURS:g})")
+    return parser.parse_args(argv)
+
+
+def parse_ttl_overrides(values):
+    ttls = {}
+    for value in values or []:
+        name, sep, hours = value.rpartition("=")
+        try:
+            ttls[name.strip()] = float(hours)
+        except ValueError:
+            sep = ""
+        if not sep or not name.strip():
+            raise ValueError(f"Expected NAME=HOURS, got: {value}")
+    return ttls
+
+
+def apply_freshness_options(scraper, args):
+    scraper.ttl_overrides = parse_ttl_overrides(args.ttl)
+    scraper.default_ttl = args.default_ttl
+
+
+def parse_category_overrides(values):
+    categories = {}
+    for value in values or []:
+        name, sep, url = value.partition("=")
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f"Expected NAME=URL, got: {value}")
+        categories[name.strip()] = url.strip()
+    return categories
+
+
+def run_replay(args):
+    scraper = VoilaFocusedScraper()
+    if args.category:
+        scraper.target_categories = parse_category_overrides(args.category)
+
+    print(f"🔁 Replaying captured payloads from {args.replay_dir}")
+    for category_name in scraper.target_categories:
+        found = scraper.replay_captures(category_name, args.replay_dir)
+        print(f"  {category_name}: {found} products")
+        if found:
+            scraper.save_category_results(category_name)
+
+    scraper.save_results()
+
+
+def run_snapshot_parse(args):
+    scraper = VoilaFocusedScraper()
+    for category_name in scraper.parse_snapshots(args.parse_snapshots, args.parse_processes):
+        scraper.save_category_results(category_name)
+
+    scraper.save_results()
+
+
+def run_history_report(args):
+    store = PriceHistoryStore(args.history_db)
+    try:
+        if args.export_run is not None:
+            count = store.export_csv(args.export_run, FINAL_FILE)
+            store.export_csv(args.export_run, "voila_budget_items_FINAL.csv", max_price=5.0)
+            print(f"📁 Exported {count} products from run {args.export_run}")
+            return
+
+        runs = tuple(args.compare_runs) if args.compare_runs else store.latest_run_pair()
+        if not runs:
+            print("Need at least two recorded runs to compare.")
+            return
+
+        old_run, new_run = runs
+        reports = {
+            "price-changes": ("💲 Price changes", store.price_changes),
+            "new": ("🆕 New items", store.new_items),
+            "removed": ("🗑️  Removed items", store.removed_items),
+            "promotions": ("🏷️  Promotion changes", store.promotion_changes),
+        }
+        kinds = list(reports) if args.history_report == "all" else [args.history_report]
+
+        print(f"Comparing run {old_run} → run {new_run}")
+        for kind in kinds:
+            title, query = reports[kind]
+            rows = query(old_run, new_run)
+            print(f"\n{title} ({len(rows)}):")
+            for row in rows:
+                print("  " + json.dumps(row, ensure_ascii=False))
+    finally:
+        store.close()
+
+
+def run_query(args):
+    source = args.history_db if args.query_source == "history" else args.query_source
+    if not os.path.exists(source):
+        print(f"❌ Nothing to query: {source} does not exist (scrape first or pass --query-source)",
+              file=sys.stderr)
+        return
+
+    categories = list(args.in_category or [])
+    if args.group:
+        categories.extend(name for name in CATEGORY_GROUPS[args.group] if name not in categories)
+    filters = dict(categories=categories or None, sort_by=args.sort_by, basis=args.unit_basis,
+                   max_price=args.max_price, max_unit_price=args.max_unit_price,
+                   on_promotion=args.on_promotion, limit=args.top)
+
+    if args.query_source != "history":
+        for row in BudgetIndex.from_csv(source).query(**filters):
+            print(BudgetIndex.compact(row))
+        return
+
+    # The history store keeps its indexes on disk, so a query only reads the rows it prints
+    store = PriceHistoryStore(source)
+    try:
+        run_ids = store.run_ids()
+        if not run_ids:
+            print(f"❌ Nothing to query: {source} has no finished runs", file=sys.stderr)
+            return
+        for row in store.query_products(run_ids[-1], **filters):
+            print(BudgetIndex.compact(row))
+    finally:
+        store.close()
+
+
+def create_scraper(args, history_db=None, metrics=None):
+    return VoilaFocusedScraper(headless=args.headless, extraction_engine=args.engine, rate_limit=args.rate_limit,
+                               capture_network=args.capture, capture_dir=args.capture_dir,
+                               fetch_engine=args.fetch,
+                               http_concurrency=args.http_concurrency, snapshot_dir=args.snapshot_dir,
+                               snapshot_every=args.snapshot_every, history_db=history_db,
+                               lean=args.lean, profile_dir=args.profile_dir, metrics=metrics,
+                               bounded_dom=args.bounded_dom)
+
+
+def load_store_config(args):
+    if args.stores:
+        with open(args.stores, encoding='utf-8') as f:
+            return json.load(f)
+
+    categories = parse_category_overrides(args.category) or VoilaFocusedScraper().target_categories
+    return {DEFAULT_STORE: categories}
+
+
+def run_enqueue(args):
+    stores = load_store_config(args)
+    jobs = [(store, category_name, url) for store, categories in stores.items()
+            for category_name, url in categories.items()]
+
+    # Each enqueued round becomes one run in the history store, filled in job by job
+    history = PriceHistoryStore(args.history_db)
+    work_queue = WorkQueue(args.queue_db)
+    try:
+        run_id = history.start_run(time.strftime('%Y-%m-%d %H:%M:%S'))
+        active = work_queue.enqueue(jobs, run_id)
+    finally:
+        work_queue.close()
+        history.close()
+
+    print(f"📥 Queued {len(jobs)} jobs across {len(stores)} stores as run {run_id} in {args.queue_db}")
+    if active:
+        print(f"⚠️  {active} jobs were still leased; their workers' results will be discarded")
+
+
+def run_queue_status(args):
+    work_queue = WorkQueue(args.queue_db)
+    try:
+        jobs = work_queue.jobs()
+    finally:
+        work_queue.close()
+
+    now = time.time()
+    print("📋 Queue status:")
+    counts = {}
+    for job in jobs:
+        status = job['status']
+        if status == 'leased' and job['lease_expires'] < now:
+            status = 'expired'
+        counts[status] = counts.get(status, 0) + 1
+        detail = f"attempt {job['attempts']}"
+        if job['status'] == 'leased':
+            detail += f", {job['lease_owner']}, lease {job['lease_expires'] - now:+.0f}s"
+        if job['last_error']:
+            detail += f", last error: {job['last_error']}"
+        print(f"  [{status}] {job['store']} / {job['category']} (run {job['run_id']}, {detail})")
+
+    print("\n" + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+
+def run_queue_worker(args):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    max_attempts = args.retries + 1
+    home = os.getcwd()
+    history = PriceHistoryStore(os.path.abspath(args.history_db))
+    work_queue = WorkQueue(os.path.abspath(args.queue_db))
+    generations = itertools.count()
+
+    def create_worker_scraper(metrics=None):
+        worker_scraper = create_scraper(args, metrics=metrics)
+        worker_scraper.write_progress_files = False
+        if worker_scraper.profile_dir:
+            # Chrome locks its profile, so each worker process (and each replacement browser) gets its own
+            generation = next(generations)
+            suffix = f"-{os.getpid()}" + (f"-{generation}" if generation else "")
+            worker_scraper.profile_dir = os.path.join(home, worker_scraper.profile_dir + suffix)
+        return worker_scraper
+
+    scraper = create_worker_scraper()
+    print(f"👷 Queue worker {owner} polling {args.queue_db}")
+
+    try:
+        while True:
+            job = work_queue.lease(owner, args.lease_seconds, max_attempts)
+            if job is None:
+                if not work_queue.open_jobs():
+                    print("✅ Queue drained")
+                    break
+                # Other workers still hold leases; wait in case one of them expires
+                time.sleep(max(1.0, args.lease_seconds / 4))
+                continue
+
+            store, category_name = job['store'], job['category']
+            if job['expired_owner']:
+                print(f"♻️  Taking over {store} / {category_name} from {job['expired_owner']} (lease expired)")
+            print(f"\n🔒 Leased {store} / {category_name} (attempt {job['attempts']}/{max_attempts})")
+
+            lost = threading.Event()
+            stopped = threading.Event()
+            deadline = time.time() + args.category_timeout
+
+            # Both threads get their state as arguments: an abandoned one must not see the next job's variables
+            def keep_lease(job, stopped, lost, deadline):
+                # Heartbeats stop at the job's deadline, so even a wedged worker lets its lease expire
+                while not stopped.wait(args.lease_seconds / 3) and time.time() < deadline:
+                    if not work_queue.heartbeat(job, owner, args.lease_seconds):
+                        lost.set()
+                        return
+
+            result = {'ok': False, 'error': f"timed out after {args.category_timeout:.0f}s"}
+
+            def run_job(job_scraper, job, result):
+                category_name = job['category']
+                try:
+                    job_scraper.products = ProductStore()
+                    job_scraper.target_categories = {category_name: job['url']}
+                    job_scraper.discovered_endpoints = {}
+                    job_scraper.load_discovered_endpoints()
+                    ok = job_scraper.run_category(category_name)
+                    if ok and job_scraper.capture_network:
+                        job_scraper.save_discovered_endpoints()
+                    result.update(ok=ok, error=None if ok else "no products saved")
+                except Exception as e:
+                    result.update(ok=False, error=str(e))
+
+            threading.Thread(target=keep_lease, args=(job, stopped, lost, deadline), daemon=True).start()
+
+            # Each store keeps its own files; the scraper holds the absolute path, so an abandoned
+            # attempt can only ever write into its own store's directory
+            scraper.output_dir = os.path.join(home, "voila_stores", scraper.safe_category_name(store))
+            os.makedirs(scraper.output_dir, exist_ok=True)
+            job_thread = threading.Thread(target=run_job, args=(scraper, job, result), daemon=True)
+            try:
+                job_thread.start()
+                job_thread.join(args.category_timeout)
+            finally:
+                stopped.set()
+
+            if job_thread.is_alive():
+                # Abandon the stuck attempt: it may not write any more files, and quitting Chrome unblocks it
+                scraper.cancelled.set()
+                threading.Thread(target=scraper.close, daemon=True).start()
+                scraper = create_worker_scraper(scraper.metrics)
+            ok, error = result['ok'], result['error']
+
+            if lost.is_set():
+                print(f"⚠️  Lost the lease on {store} / {category_name}; discarding this attempt")
+            elif ok:
+                import pandas as pd
+
+                df = normalize_unit_prices(pd.DataFrame(scraper.products.as_dicts(), columns=PRODUCT_COLUMNS))
+                history.add_observations(job['run_id'], df.to_dict('records'), store)
+                if work_queue.complete(job, owner):
+                    print(f"✅ {store} / {category_name}: recorded {len(df)} products in run {job['run_id']}")
+            else:
+                status = work_queue.fail(job, owner, error, max_attempts)
+                print(f"✗ {store} / {category_name} failed ({error}); job is now {status}")
+
+            if job['run_id'] is not None and not work_queue.open_jobs(job['run_id']):
+                history.finish_run(job['run_id'])
+                print(f"🏁 Run {job['run_id']} complete")
+    except KeyboardInterrupt:
+        print("\n⚠️  Worker interrupted; its lease will expire and another worker will retry the job")
+    finally:
+        if not args.no_metrics:
+            scraper.write_metrics(args.metrics_file or f"voila_metrics_worker_{os.getpid()}.json",
+                                  args.metrics_format)
+        scraper.close()
+        work_queue.close()
+        history.close()
+
+
+def run_status(args):
+    scraper = VoilaFocusedScraper()
+    if args.category:
+        scraper.target_categories = parse_category_overrides(args.category)
+    apply_freshness_options(scraper, args)
+
+    existing_files, missing_categories, _ = scraper.check_existing_files()
+    metadata = scraper.load_scrape_metadata()
+    print("📋 Category status:")
+    for category_name, filename in existing_files:
+        with open(filename, encoding='utf-8') as f:
+            rows = max(0, sum(1 for _ in f) - 1)
+        scraped_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(os.path.getmtime(filename)))
+        age = scraper.category_age_hours(category_name, metadata)
+        ttl = scraper.category_ttl(category_name, metadata)
+        print(f"  ✅ {category_name}: {rows} products ({filename}, {scraped_at}, "
+              f"fresh for {ttl - age:.1f}h more)")
+
+    for category_name in missing_categories:
+        checkpoint = scraper.load_checkpoint(category_name)
+        if scraper.stale_reasons[category_name] != "missing":
+            print(f"  ⏰ {category_name}: {scraper.stale_reasons[category_name]}")
+        elif checkpoint:
+            print(f"  🟡 {category_name}: interrupted at scroll {checkpoint['scroll_count']} "
+                  f"({checkpoint['updated_at']})")
+        else:
+            print(f"  ❌ {category_name}: not scraped")
+
+    print(f"\n{len(existing_files)} fresh, {len(missing_categories)} to scrape")
+
 
 def main():
+    args = parse_args()
+
+    # Query output is JSONL for other programs, so it skips the banner
+    if args.query:
+        run_query(args)
+        return
+
     print("Voila Focused Grocery Scraper")
     print("Targeting specific categories for meal planning")
     print("=" * 50)
 
-    scraper = VoilaFocusedScraper(headless=False)
+    if args.status:
+        run_status(args)
+        return
+
+    if args.replay_dir:
+        run_replay(args)
+        return
+
+    if args.parse_snapshots:
+        run_snapshot_parse(args)
+        return
+
+    if args.history_report or args.export_run is not None:
+        run_history_report(args)
+        return
+
+    if args.enqueue:
+        run_enqueue(args)
+        return
+
+    if args.queue_status:
+        run_queue_status(args)
+        return
+
+    if args.worker:
+        run_queue_worker(args)
+        return
+
+    scraper = create_scraper(args, history_db=None if args.no_history else args.history_db)
+    if args.category:
+        scraper.target_categories = parse_category_overrides(args.category)
+    apply_freshness_options(scraper, args)
+    scraper.load_discovered_endpoints()
 
     try:
         if scraper.is_auto_restart():
@@ -465,7 +3137,9 @@ def main():
         print("Do you want to test category URLs before scraping?")
         print("This helps verify that all URLs are working correctly.")
 
-        while True:
+        # Unattended restarts must never block on a prompt
+        test_urls = False
+        while not scraper.is_auto_restart():
             test_choice = input("\nTest URLs? (y/n): ").strip().lower()
             if test_choice in ['y', 'yes']:
                 test_urls = True
@@ -486,8 +3160,8 @@ def main():
                     category_url = scraper.target_categories[category_name]
                     print(f"Testing: {category_name}")
                     try:
-                        scraper.driver.get(category_url)
-                        time.sleep(2)
+                        scraper.navigate(category_url)
+                        scraper.wait_for_page_load()
 
                         page_title = scraper.driver.title
 
@@ -502,7 +3176,15 @@ def main():
                     except Exception as e:
                         print(f"  ✗ {category_name} failed to load: {e}")
 
-        scraper.scrape_all_target_categories(categories_to_scrape)
+        if args.schedule:
+            scraper.max_retries = args.retries
+            asyncio.run(scraper.run_scheduled(categories_to_scrape, concurrency=args.workers,
+                                              category_timeout=args.category_timeout, deadline=args.deadline,
+                                              backoff=args.backoff))
+        elif args.workers > 1:
+            scraper.scrape_categories_parallel(categories_to_scrape, workers=args.workers)
+        else:
+            scraper.scrape_all_target_categories(categories_to_scrape)
         scraper.save_results()
 
         if scraper.products:
@@ -522,6 +3204,10 @@ def main():
         print(f"\n💥 UNEXPECTED ERROR: {e}")
 
     finally:
+        if not args.no_metrics:
+            extension = "prom" if args.metrics_format == "prometheus" else "json"
+            metrics_file = args.metrics_file or f"voila_metrics_{time.strftime('%Y%m%d_%H%M%S')}.{extension}"
+            scraper.write_metrics(metrics_file, args.metrics_format)
         try:
             scraper.close()
         except:
@@ -0,0 +1,173 @@
+import json
+import time
+import urllib.request
+
+import pytest
+
+from benchmark import FixtureServer
+from main import UNIT_PRICE_BASIS, BudgetIndex, PriceHistoryStore, VoilaFocusedScraper, WorkQueue
+
+
+CATEGORY = "Cheese"
+SLUG = "cheese"
+PRODUCTS = 95
+PAGE_SIZE = 20
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = FixtureServer(products=PRODUCTS, page_size=PAGE_SIZE, latency_ms=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def api_url(server, page, size=PAGE_SIZE):
+    return f"{server.base_url}/api/products?category={SLUG}&page={page}&size={size}"
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def expected_products(server, count=PRODUCTS):
+    return [{
+        'name': item['name'],
+        'price': float(item['price']['current']['amount']),
+        'size': item['size']['value'],
+        'unit_price': None,
+        'category': CATEGORY,
+        'has_price': True,
+        'promotion': item['promotions'][0]['description'] if item['promotions'] else None
+    } for item in server.catalog(SLUG)[:count]]
+
+
+def test_iter_payload_products_finds_nested_records(server):
+    payload = get_json(api_url(server, 1))
+    nested = {'data': {'search': {'results': payload['products']}}, 'total': payload['total']}
+
+    items = list(VoilaFocusedScraper().iter_payload_products(nested))
+
+    assert items == payload['products']
+
+
+def test_process_payload_maps_recorded_products(server):
+    scraper = VoilaFocusedScraper()
+
+    assert scraper.process_payload(CATEGORY, get_json(api_url(server, 1))) == PAGE_SIZE
+    # The same payload again adds nothing
+    assert scraper.process_payload(CATEGORY, get_json(api_url(server, 1))) == 0
+    assert scraper.products.category_products(CATEGORY) == expected_products(server, PAGE_SIZE)
+
+
+def test_replay_captures_rebuilds_products(server, tmp_path):
+    recorder = VoilaFocusedScraper(capture_dir=str(tmp_path))
+    for page in (1, 2):
+        recorder.record_capture(CATEGORY, api_url(server, page), get_json(api_url(server, page)))
+
+    scraper = VoilaFocusedScraper()
+
+    assert scraper.replay_captures(CATEGORY, str(tmp_path)) == 2 * PAGE_SIZE
+    assert scraper.products.category_products(CATEGORY) == expected_products(server, 2 * PAGE_SIZE)
+
+
+def test_infer_listings_finds_page_and_offset_parameters():
+    scraper = VoilaFocusedScraper()
+
+    pages = scraper.infer_listings(["https://shop.test/api/products?category=cheese&page=2&size=40",
+                                    "https://shop.test/api/products?category=cheese&page=3&size=40"])
+    offsets = scraper.infer_listings(["https://shop.test/api/search?q=milk&offset=40&limit=20",
+                                      "https://shop.test/api/search?q=milk&offset=60&limit=20"])
+    single = scraper.infer_listings(["https://shop.test/api/deals"])
+
+    assert [(listing['param'], listing['start'], listing['step']) for listing in pages] == [('page', 1, 1)]
+    assert [(listing['param'], listing['start'], listing['step']) for listing in offsets] == [('offset', 0, 20)]
+    assert scraper.listing_url(offsets[0], 3) == "https://shop.test/api/search?q=milk&offset=60&limit=20"
+    assert single == [{'url': "https://shop.test/api/deals", 'param': None, 'start': 0, 'step': 0}]
+
+
+def test_fetch_listing_pages_through_the_whole_category(server):
+    scraper = VoilaFocusedScraper(http_concurrency=3)
+    scraper.discovered_endpoints = {CATEGORY: [api_url(server, 2), api_url(server, 3)]}
+
+    assert scraper.fetch_category_http(CATEGORY) == PRODUCTS
+    assert sorted(scraper.products.category_products(CATEGORY), key=lambda p: p['name']) == sorted(
+        expected_products(server), key=lambda p: p['name'])
+
+
+def test_work_queue_lease_expiry_and_takeover(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue([("north", CATEGORY, "https://shop.test/cheese")], run_id=1)
+
+    job = queue.lease("host-a:1", lease_seconds=0.2, max_attempts=2)
+    assert (job['store'], job['category'], job['attempts'], job['expired_owner']) == ("north", CATEGORY, 1, None)
+    # A live lease is not handed out twice
+    assert queue.lease("host-b:1", lease_seconds=60, max_attempts=2) is None
+
+    time.sleep(0.3)
+    taken = queue.lease("host-b:1", lease_seconds=60, max_attempts=2)
+    assert (taken['attempts'], taken['expired_owner']) == (2, "host-a:1")
+    # The first owner lost the lease, so it can neither renew nor finish the job
+    assert not queue.heartbeat(job, "host-a:1", 60)
+    assert not queue.complete(job, "host-a:1")
+
+    assert queue.complete(taken, "host-b:1")
+    assert queue.open_jobs(1) == 0
+    queue.close()
+
+
+def test_work_queue_fails_jobs_out_of_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue([("north", CATEGORY, "https://shop.test/cheese")], run_id=None)
+
+    job = queue.lease("host-a:1", lease_seconds=0.1, max_attempts=1)
+    assert queue.fail(job, "host-a:1", "boom", max_attempts=2) == 'pending'
+    queue.lease("host-a:1", lease_seconds=0.1, max_attempts=2)
+    time.sleep(0.2)
+
+    assert queue.lease("host-b:1", lease_seconds=60, max_attempts=2) is None
+    assert [(row['status'], row['last_error']) for row in queue.jobs()] == [('failed', 'lease expired')]
+    queue.close()
+
+
+BASIS = UNIT_PRICE_BASIS['g']
+BUDGET_ROWS = [
+    {'name': 'Chicken Thighs', 'price': 8.0, 'size': '1 kg', 'unit_price': 0.8, 'unit_price_basis': BASIS,
+     'category': 'Meat & Seafood', 'promotion': 'Save $2.00'},
+    {'name': 'Eggs', 'price': 4.5, 'size': '12 ct', 'unit_price': 0.375, 'unit_price_basis': 'each',
+     'category': 'Dairy & Eggs', 'promotion': None},
+    {'name': 'Greek Yogurt', 'price': 5.0, 'size': '750 g', 'unit_price': 0.667, 'unit_price_basis': BASIS,
+     'category': 'Dairy & Eggs', 'promotion': None},
+    {'name': 'Salmon', 'price': 12.0, 'size': '400 g', 'unit_price': 3.0, 'unit_price_basis': BASIS,
+     'category': 'Meat & Seafood', 'promotion': None},
+    {'name': 'Cheddar', 'price': 6.0, 'size': '400 g', 'unit_price': 1.5, 'unit_price_basis': BASIS,
+     'category': 'Cheese', 'promotion': 'Save $1.00'},
+    {'name': 'Mystery Box', 'price': None, 'size': 'Unknown', 'unit_price': None, 'unit_price_basis': None,
+     'category': 'Cheese', 'promotion': None},
+]
+QUERIES = [
+    ({}, ['Greek Yogurt', 'Chicken Thighs', 'Cheddar', 'Salmon']),
+    ({'sort_by': 'price'}, ['Eggs', 'Greek Yogurt', 'Cheddar', 'Chicken Thighs', 'Salmon']),
+    ({'categories': ['Meat & Seafood', 'Cheese'], 'max_unit_price': 2.0}, ['Chicken Thighs', 'Cheddar']),
+    ({'on_promotion': True, 'max_price': 7.0}, ['Cheddar']),
+    ({'basis': 'each'}, ['Eggs']),
+    ({'limit': 2}, ['Greek Yogurt', 'Chicken Thighs']),
+    ({'categories': ['Bakery']}, []),
+]
+
+
+@pytest.mark.parametrize("filters, names", QUERIES)
+def test_budget_index_query(filters, names):
+    index = BudgetIndex(BUDGET_ROWS)
+
+    assert [row['name'] for row in index.query(**filters)] == names
+
+
+@pytest.mark.parametrize("filters, names", QUERIES)
+def test_history_query_matches_budget_index(tmp_path, filters, names):
+    store = PriceHistoryStore(str(tmp_path / "history.db"))
+    run_id = store.record_run(BUDGET_ROWS, "2026-01-01 00:00:00")
+
+    assert [row['name'] for row in store.query_products(run_id, **filters)] == names
+    store.close()